@@ -2,19 +2,37 @@ import logging
 import psycopg_pool
 from aiogram import Dispatcher, Bot
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.redis import RedisStorage
+from app.bot.fsm.isolation import KeyedEventIsolation
+from app.bot.fsm.serialization import SERIALIZERS, CompactKeyBuilder
+from app.bot.fsm.storage import CachedRedisStorage, FSMCache
 from app.bot.handlers.admin import admin_router
 from app.bot.handlers.others import others_router
 from app.bot.handlers.settings import settings_router
 from app.bot.handlers.user import user_router
 from app.bot.i18n.translator import get_translator
+from app.bot.keyboards.ui_cache import UICache
 from app.bot.middlewares.database import DataBaseMiddleware
+from app.bot.middlewares.fsm_snapshot import FSMSnapshotMiddleware
 from app.bot.middlewares.i18n import TranslatorMiddleware
 from app.bot.middlewares.lang_settings import LangSettingsMiddleware
+from app.bot.middlewares.metrics import HandlerMetricsMiddleware, TimedMiddleware, UpdateMetricsMiddleware
 from app.bot.middlewares.shadow_ban import SwadowBanMiddleware
 from app.bot.middlewares.statistics import ActivityCounterMiddleware
-from app.infrastructure.database.connections import get_pg_pool
+from app.bot.middlewares.user_context import UserContextLoaderMiddleware
+from app.bot.services.active_users import ActiveUsersCounter
+from app.bot.services.broadcast import Broadcaster
+from app.bot.services.media_groups import MediaGroupEchoBuffer
+from app.bot.services.menu_sync import MenuSynchronizer
+from app.bot.services.outbound import ThrottledSession
+from app.bot.webhook import run_webhook
+from app.infrastructure.database.activity import ActivityAggregator, ActivityPartitionMaintainer
+from app.infrastructure.database.banned_users import BannedUsersRegistry
+from app.infrastructure.database.user_context import user_context_invalidator
+from app.infrastructure.database.connections import build_pg_conninfo, get_pg_pool
+from app.infrastructure.database.pool_stats import PoolStatsReporter
+from app.infrastructure.metrics import gauges, registry, start_metrics_server
 from config.config import Config
 from redis.asyncio import Redis
 
@@ -22,25 +40,79 @@ from redis.asyncio import Redis
 logger = logging.getLogger(__name__)
 
 
+def setup_dispatcher(dp: Dispatcher, metrics: bool = False) -> None:
+    routers = (settings_router, admin_router, user_router, others_router)
+
+    logger.info('Including routers ...')
+    dp.include_routers(*routers)
+
+    logger.info('Including middlewares ...')
+    middlewares = (
+        FSMSnapshotMiddleware(),
+        SwadowBanMiddleware(),
+        DataBaseMiddleware(),
+        UserContextLoaderMiddleware(),
+        ActivityCounterMiddleware(),
+        LangSettingsMiddleware(),
+        TranslatorMiddleware(),
+    )
+    for middleware in middlewares:
+        dp.update.middleware(TimedMiddleware(middleware) if metrics else middleware)
+
+    if metrics:
+        dp.update.outer_middleware(UpdateMetricsMiddleware())
+        handler_metrics = HandlerMetricsMiddleware()
+        for router in routers:
+            for name, observer in router.observers.items():
+                if name != 'update':
+                    observer.middleware(handler_metrics)
+
+
 async def main(config: Config) -> None:
     logger.info('Starting bot ...')
 
-    storage = RedisStorage(
-        redis=Redis(
-            host=config.redis.host,
-            port=config.redis.port,
-            db=config.redis.db,
-            password=config.redis.password,
-            username=config.redis.username,
-        )
+    redis = Redis(
+        host=config.redis.host,
+        port=config.redis.port,
+        db=config.redis.db,
+        password=config.redis.password,
+        username=config.redis.username,
+    )
+
+    json_dumps, json_loads = SERIALIZERS[config.redis.fsm_serializer]
+
+    storage = CachedRedisStorage(
+        redis=redis,
+        key_builder=CompactKeyBuilder(prefix=config.redis.fsm_key_prefix),
+        state_ttl=config.redis.fsm_state_ttl,
+        data_ttl=config.redis.fsm_data_ttl,
+        json_loads=json_loads,
+        json_dumps=json_dumps,
+        cache=FSMCache(
+            ttl=config.redis.fsm_cache_ttl,
+            max_size=config.redis.fsm_cache_size,
+            max_bytes=config.redis.fsm_cache_bytes,
+        ),
     )
+    storage.start()
 
     bot = Bot(
         token=config.bot.token,
+        session=ThrottledSession(
+            api=TelegramAPIServer.from_base(config.bot.api_base_url),
+            rate=config.bot.outbound_rate,
+            chat_rate=config.bot.outbound_chat_rate,
+            chat_burst=config.bot.outbound_chat_burst,
+            group_rate=config.bot.outbound_group_rate,
+            max_retries=config.bot.outbound_max_retries,
+        ),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
 
-    dp = Dispatcher(storage=storage)
+    dp = Dispatcher(
+        storage=storage,
+        events_isolation=KeyedEventIsolation(max_in_flight=config.bot.max_concurrent_updates),
+    )
 
     db_pool: psycopg_pool.AsyncConnectionPool = await get_pg_pool(
         db_name=config.db.name,
@@ -48,32 +120,124 @@ async def main(config: Config) -> None:
         port=config.db.port,
         user=config.db.user,
         password=config.db.password,
+        min_size=config.db.pool_min_size,
+        max_size=config.db.pool_max_size,
+        timeout=config.db.pool_timeout,
+        max_idle=config.db.pool_max_idle,
+        max_lifetime=config.db.pool_max_lifetime,
+        prepare_threshold=config.db.prepare_threshold,
     )
 
+    pool_stats_reporter = PoolStatsReporter(db_pool, interval=config.db.pool_stats_interval)
+    pool_stats_reporter.start()
+
+    banned_users = BannedUsersRegistry(db_pool, redis)
+    await banned_users.load()
+    banned_users.start()
+
+    user_context_invalidator.start(redis)
+
+    activity_aggregator = ActivityAggregator(db_pool)
+    activity_aggregator.start()
+
+    activity_partitions = ActivityPartitionMaintainer(
+        db_pool,
+        retention_days=config.db.activity_retention_days,
+        ahead_days=config.db.activity_partitions_ahead,
+        interval=config.db.activity_maintenance_interval,
+    )
+    activity_partitions.start()
+
+    active_users = ActiveUsersCounter(redis, ttl_days=config.redis.active_users_ttl_days)
+    active_users.start()
+
     translations = get_translator()
 
-    locales = list(translations.keys())
+    ui = UICache(translations)
+    locales = ui.locales
 
-    logger.info('Including routers ...')
-    dp.include_routers(settings_router, admin_router, user_router, others_router)
+    broadcaster = Broadcaster(
+        bot=bot,
+        redis=redis,
+        db_pool=db_pool,
+        conninfo=build_pg_conninfo(
+            db_name=config.db.name,
+            host=config.db.host,
+            port=config.db.port,
+            user=config.db.user,
+            password=config.db.password,
+        ),
+        translations=translations,
+    )
+    await broadcaster.resume_all()
+    broadcaster.start_resuming()
 
-    logger.info('Including middlewares ...')
-    dp.update.middleware(DataBaseMiddleware())
-    dp.update.middleware(SwadowBanMiddleware())
-    dp.update.middleware(ActivityCounterMiddleware())
-    dp.update.middleware(LangSettingsMiddleware())
-    dp.update.middleware(TranslatorMiddleware())
+    menu = MenuSynchronizer(bot=bot, redis=redis, ui=ui)
+    await menu.start()
+
+    media_groups = MediaGroupEchoBuffer(bot)
+    # Shutdown handlers run before polling or the webhook server closes the Bot API session,
+    # so albums still being collected are sent over a live one
+    dp.shutdown.register(media_groups.stop)
+
+    setup_dispatcher(dp, metrics=config.metrics.enabled)
+
+    metrics_runner = None
+    registry.enabled = config.metrics.enabled
+    if config.metrics.enabled:
+        registry.register_collector(lambda: gauges('db_pool', pool_stats_reporter.snapshot()))
+        registry.register_collector(lambda: {
+            name: value
+            for priority, stats in bot.session.snapshot().items()
+            for name, value in gauges('telegram_outbound', stats, f'priority="{priority}"').items()
+        })
+        registry.register_collector(lambda: gauges('fsm_cache', {
+            'entries': len(storage.cache),
+            'bytes': storage.cache.nbytes,
+        }))
+        registry.register_collector(lambda: {'banned_users': len(banned_users.index)})
+        metrics_runner = await start_metrics_server(config.metrics.host, config.metrics.port)
+
+    workflow_data = dict(
+        db_pool=db_pool,
+        pool_stats_reporter=pool_stats_reporter,
+        banned_users=banned_users,
+        activity_aggregator=activity_aggregator,
+        active_users=active_users,
+        broadcaster=broadcaster,
+        translations=translations,
+        locales=locales,
+        ui=ui,
+        menu=menu,
+        media_groups=media_groups,
+        admin_ids=config.bot.admin_ids,
+    )
 
     try:
-        await dp.start_polling(
-            bot,
-            db_pool=db_pool,
-            translations=translations,
-            locales=locales,
-            admin_ids=config.bot.admin_ids,
-        )
+        if config.webhook.enabled:
+            logger.info('Starting in webhook mode ...')
+            await run_webhook(dp, bot, config.webhook, **workflow_data)
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(
+                bot,
+                tasks_concurrency_limit=config.bot.max_pending_updates,
+                **workflow_data,
+            )
     except Exception as e:
         logger.error(e)
     finally:
+        await bot.session.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await menu.stop()
+        await broadcaster.stop()
+        await activity_aggregator.stop()
+        await activity_partitions.stop()
+        await active_users.stop()
+        await banned_users.stop()
+        await user_context_invalidator.stop()
+        await pool_stats_reporter.stop()
+        await storage.stop()
         await db_pool.close()
         logger.info('Connection to PostgreSQL closed')
\ No newline at end of file
@@ -1,13 +1,12 @@
 from aiogram.filters import BaseFilter
 from aiogram.types import CallbackQuery, Message
-from psycopg import AsyncConnection
 
 from app.bot.enums.roles import UserRole
-from app.infrastructure.database.db import get_user_role
+from app.infrastructure.database.user_context import UserContext
 
 
 class LocaleFilter(BaseFilter):
-    async def __call__(self, callback: CallbackQuery, locales: list):
+    async def __call__(self, callback: CallbackQuery, locales: frozenset[str]):
         if not isinstance(callback, CallbackQuery):
             raise ValueError(
                 f"LocaleFilter: expected `CallbackQuery`, got `{type(callback).__name__}`"
@@ -29,13 +28,12 @@ class UserRoleFilter(BaseFilter):
         if not self.roles:
             raise ValueError("No valid roles provided to `UserRoleFilter`.")
 
-    async def __call__(self, event: Message | CallbackQuery, conn: AsyncConnection) -> bool:
-        user = event.from_user
-        if not user:
+    async def __call__(
+            self,
+            event: Message | CallbackQuery,
+            user_context: UserContext | None = None,
+    ) -> bool:
+        if not event.from_user or user_context is None:
             return False
 
-        role = await get_user_role(conn, user_id=user.id)
-        if role is None:
-            return False
-
-        return role in self.roles
\ No newline at end of file
+        return user_context.role in self.roles
\ No newline at end of file
@@ -0,0 +1,61 @@
+from typing import Any
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+
+class BufferedFSMContext(FSMContext):
+    def __init__(self, storage: BaseStorage, key: StorageKey, state: str | None = None):
+        super().__init__(storage=storage, key=key)
+        self._state = state
+        self._data: dict[str, Any] | None = None
+        self._state_dirty = False
+        self._data_dirty = False
+
+    async def set_state(self, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        # Handlers often reset a state that is already gone, that is not worth a write
+        if state != self._state:
+            self._state = state
+            self._state_dirty = True
+
+    async def get_state(self) -> str | None:
+        return self._state
+
+    async def set_data(self, data: dict[str, Any]) -> None:
+        if data == self._data:
+            return
+        self._data = data.copy()
+        self._data_dirty = True
+
+    async def get_data(self) -> dict[str, Any]:
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+        return self._data.copy()
+
+    async def get_value(self, key: str, default: Any | None = None) -> Any | None:
+        data = await self.get_data()
+        return data.get(key, default)
+
+    async def update_data(self, data: dict[str, Any] | None = None, **kwargs: Any) -> dict[str, Any]:
+        if data:
+            kwargs.update(data)
+
+        current = await self.get_data()
+        current.update(kwargs)
+        await self.set_data(current)
+
+        return current.copy()
+
+    async def flush(self) -> None:
+        if self._state_dirty and self._data_dirty and hasattr(self.storage, 'set_state_and_data'):
+            await self.storage.set_state_and_data(key=self.key, state=self._state, data=self._data)
+        elif self._state_dirty:
+            await self.storage.set_state(key=self.key, state=self._state)
+            if self._data_dirty:
+                await self.storage.set_data(key=self.key, data=self._data)
+        elif self._data_dirty:
+            await self.storage.set_data(key=self.key, data=self._data)
+
+        self._state_dirty = self._data_dirty = False
@@ -0,0 +1,50 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+
+class _KeyLock:
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class KeyedEventIsolation(BaseEventIsolation):
+    def __init__(self, max_in_flight: int | None = None):
+        if max_in_flight is not None and max_in_flight <= 0:
+            raise ValueError('KeyedEventIsolation: `max_in_flight` must be positive')
+
+        self._locks: dict[StorageKey, _KeyLock] = {}
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+
+    @property
+    def active_keys(self) -> int:
+        # Not __len__: an empty isolation would be falsy and Dispatcher would replace it
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        key_lock = self._locks.get(key)
+        if key_lock is None:
+            key_lock = self._locks[key] = _KeyLock()
+        key_lock.users += 1
+
+        try:
+            # Updates queued behind the same user's lock do not take a global slot
+            async with key_lock.lock:
+                if self._semaphore is None:
+                    yield
+                else:
+                    async with self._semaphore:
+                        yield
+        finally:
+            key_lock.users -= 1
+            if not key_lock.users:
+                del self._locks[key]
+
+    async def close(self) -> None:
+        self._locks.clear()
@@ -0,0 +1,95 @@
+import logging
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from app.bot.fsm.serialization import CompactKeyBuilder, msgpack_loads
+from app.bot.fsm.storage import PipelinedRedisStorage, strip_none
+
+
+logger = logging.getLogger(__name__)
+
+# What DefaultKeyBuilder wrote before CompactKeyBuilder
+LEGACY_PREFIX = 'fsm'
+
+
+@dataclass(slots=True)
+class LegacyKeysMigration:
+    # States and data copied to the compact layout, legacy keys removed, keys left alone
+    states: int = 0
+    data: int = 0
+    removed: int = 0
+    skipped: int = 0
+
+
+def compact_key(key: str, key_builder: CompactKeyBuilder, legacy_prefix: str = LEGACY_PREFIX) -> str | None:
+    # `fsm:42:42:state` -> `f:42:42:s`, the parts in between are built the same way by both builders
+    head, separator, part = key.rpartition(key_builder.separator)
+    if part not in CompactKeyBuilder.PARTS or not head.startswith(f'{legacy_prefix}{separator}'):
+        return None
+    return key_builder.separator.join(
+        (f'{key_builder.prefix}{head[len(legacy_prefix):]}', CompactKeyBuilder.PARTS[part])
+    )
+
+
+async def migrate_legacy_keys(
+        redis: Redis,
+        storage: PipelinedRedisStorage,
+        legacy_prefix: str = LEGACY_PREFIX,
+        batch_size: int = 1000,
+) -> LegacyKeysMigration:
+    # Legacy records have no TTL and are never read again. States and data are copied over with the
+    # storage TTLs unless the bot already wrote a newer record there, then the legacy keys are unlinked.
+    result = LegacyKeysMigration()
+    batch: list[str] = []
+
+    async for key in redis.scan_iter(match=f'{legacy_prefix}{storage.key_builder.separator}*', count=batch_size):
+        batch.append(key.decode() if isinstance(key, bytes) else key)
+        if len(batch) >= batch_size:
+            await _migrate_batch(redis, storage, batch, legacy_prefix, result)
+            batch.clear()
+
+    if batch:
+        await _migrate_batch(redis, storage, batch, legacy_prefix, result)
+
+    logger.info(
+        'Legacy FSM keys migrated: %s states, %s data, %s removed, %s skipped',
+        result.states, result.data, result.removed, result.skipped,
+    )
+    return result
+
+
+async def _migrate_batch(
+        redis: Redis,
+        storage: PipelinedRedisStorage,
+        keys: list[str],
+        legacy_prefix: str,
+        result: LegacyKeysMigration,
+) -> None:
+    targets = {key: compact_key(key, storage.key_builder, legacy_prefix) for key in keys}
+    known = [key for key, target in targets.items() if target is not None]
+    result.skipped += len(keys) - len(known)
+    if not known:
+        return
+
+    values = await redis.mget(known)
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, value in zip(known, values):
+            target = targets[key]
+            if value is None or key.endswith(f'{storage.key_builder.separator}lock'):
+                continue
+
+            if key.endswith(f'{storage.key_builder.separator}state'):
+                pipe.set(target, value, ex=storage.state_ttl, nx=True)
+                result.states += 1
+                continue
+
+            data = strip_none(msgpack_loads(value))
+            if data:
+                pipe.set(target, storage.json_dumps(data), ex=storage.data_ttl, nx=True)
+                result.data += 1
+
+        pipe.unlink(*known)
+        await pipe.execute()
+
+    result.removed += len(known)
@@ -0,0 +1,37 @@
+import json
+from typing import Any, Callable
+
+import msgpack
+from aiogram.fsm.storage.base import DefaultKeyBuilder, StorageKey
+
+
+def msgpack_dumps(data: dict[str, Any]) -> bytes:
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def msgpack_loads(value: bytes | str) -> dict[str, Any]:
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+
+    # Records written before the switch are JSON objects, and no msgpack map starts with `{`
+    if value[:1] == b'{':
+        return json.loads(value)
+
+    return msgpack.unpackb(value, raw=False)
+
+
+SERIALIZERS: dict[str, tuple[Callable[[dict[str, Any]], str | bytes], Callable[[bytes | str], dict[str, Any]]]] = {
+    'json': (json.dumps, json.loads),
+    'msgpack': (msgpack_dumps, msgpack_loads),
+}
+
+
+class CompactKeyBuilder(DefaultKeyBuilder):
+    # `fsm:42:42:state` becomes `f:42:42:s`, which adds up over millions of keys
+    PARTS = {'state': 's', 'data': 'd', 'lock': 'l'}
+
+    def __init__(self, *, prefix: str = 'f', **kwargs: Any):
+        super().__init__(prefix=prefix, **kwargs)
+
+    def build(self, key: StorageKey, part: str | None = None) -> str:
+        return super().build(key, self.PARTS.get(part, part))
@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio.client import Pipeline
+
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+FSM_INVALIDATION_CHANNEL = 'fsm_invalidation'
+
+# Rough per-entry overhead of the key, the tuple and the OrderedDict node
+ENTRY_OVERHEAD = 200
+
+
+def strip_none(data: dict[str, Any]) -> dict[str, Any]:
+    # Leftovers like `user_lang=None` read back the same as a missing field, so they are not stored
+    return {field: value for field, value in data.items() if value is not None}
+
+
+class PipelinedRedisStorage(RedisStorage):
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._queue_state(pipe, key, state)
+            await pipe.execute()
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._queue_data(pipe, key, data)
+            await pipe.execute()
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        # Passed to json_loads as is, a binary serializer can not be decoded as UTF-8
+        value = await self.redis.get(self.key_builder.build(key, 'data'))
+        return self.json_loads(value) if value is not None else {}
+
+    async def set_state_and_data(
+            self,
+            key: StorageKey,
+            state: StateType,
+            data: dict[str, Any],
+    ) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._queue_state(pipe, key, state)
+            self._queue_data(pipe, key, data)
+            await pipe.execute()
+
+    def _queue_state(self, pipe: Pipeline, key: StorageKey, state: StateType) -> str | None:
+        state = state.state if isinstance(state, State) else state
+        state_key = self.key_builder.build(key, 'state')
+
+        if state is None:
+            pipe.delete(state_key)
+        else:
+            pipe.set(state_key, state, ex=self.state_ttl)
+
+        return state
+
+    def _queue_data(self, pipe: Pipeline, key: StorageKey, data: dict[str, Any]) -> str | bytes | None:
+        data_key = self.key_builder.build(key, 'data')
+        data = strip_none(data)
+
+        if not data:
+            pipe.delete(data_key)
+            return None
+
+        value = self.json_dumps(data)
+        pipe.set(data_key, value, ex=self.data_ttl)
+        return value
+
+
+class FSMCache:
+    def __init__(self, ttl: float = 60.0, max_size: int = 100_000, max_bytes: int = 64 * 1024 * 1024):
+        if ttl <= 0:
+            raise ValueError('FSMCache: `ttl` must be positive')
+        if max_size <= 0:
+            raise ValueError('FSMCache: `max_size` must be positive')
+        if max_bytes <= 0:
+            raise ValueError('FSMCache: `max_bytes` must be positive')
+
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self.invalidate(key)
+            return MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, nbytes: int) -> None:
+        self.invalidate(key)
+
+        nbytes += len(key) + ENTRY_OVERHEAD
+        if nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, nbytes, value)
+        self.nbytes += nbytes
+
+        while len(self._entries) > self.max_size or self.nbytes > self.max_bytes:
+            _, (_, evicted_nbytes, _) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_nbytes
+
+    def invalidate(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+
+class CachedRedisStorage(PipelinedRedisStorage):
+    def __init__(
+            self,
+            *args: Any,
+            cache: FSMCache | None = None,
+            channel: str = FSM_INVALIDATION_CHANNEL,
+            reconnect_delay: float = 5.0,
+            **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        self.cache = cache if cache is not None else FSMCache()
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._origin = secrets.token_hex(4)
+        # The cache is only trusted while we are subscribed to invalidations from other processes
+        self._subscribed = False
+        self._loading: dict[str, int] = {}
+        self._stale: set[str] = set()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def close(self) -> None:
+        await self.stop()
+        await super().close()
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state_key = self.key_builder.build(key, 'state')
+        state = self.cache.get(state_key) if self._subscribed else MISSING
+        if state is not MISSING:
+            return state
+
+        self._begin_load(state_key)
+        try:
+            value = await self.redis.get(state_key)
+        finally:
+            stale = self._end_load(state_key)
+
+        state = value.decode('utf-8') if isinstance(value, bytes) else value
+        if not stale:
+            self.cache.set(state_key, state, len(value or b''))
+
+        return state
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        data_key = self.key_builder.build(key, 'data')
+        data = self.cache.get(data_key) if self._subscribed else MISSING
+        if data is not MISSING:
+            return data.copy()
+
+        self._begin_load(data_key)
+        try:
+            value = await self.redis.get(data_key)
+        finally:
+            stale = self._end_load(data_key)
+
+        data = self.json_loads(value) if value is not None else {}
+        if not stale:
+            self.cache.set(data_key, data, len(value or b''))
+
+        return data.copy()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            state = self._queue_state(pipe, key, state)
+            self._queue_invalidation(pipe, key, 'state')
+            await pipe.execute()
+
+        self._cache_state(key, state)
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            value = self._queue_data(pipe, key, data)
+            self._queue_invalidation(pipe, key, 'data')
+            await pipe.execute()
+
+        self._cache_data(key, data, value)
+
+    async def set_state_and_data(
+            self,
+            key: StorageKey,
+            state: StateType,
+            data: dict[str, Any],
+    ) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            state = self._queue_state(pipe, key, state)
+            value = self._queue_data(pipe, key, data)
+            self._queue_invalidation(pipe, key, 'state', 'data')
+            await pipe.execute()
+
+        self._cache_state(key, state)
+        self._cache_data(key, data, value)
+
+    def _queue_invalidation(self, pipe: Pipeline, key: StorageKey, *parts: str) -> None:
+        # Published in the same pipeline, so other processes hear about it right after the write lands
+        redis_keys = ' '.join(self.key_builder.build(key, part) for part in parts)
+        pipe.publish(self.channel, f'{self._origin} {redis_keys}')
+
+    def _cache_state(self, key: StorageKey, state: str | None) -> None:
+        state_key = self.key_builder.build(key, 'state')
+        self._invalidate(state_key)
+        if self._subscribed:
+            self.cache.set(state_key, state, len(state or ''))
+
+    def _cache_data(self, key: StorageKey, data: dict[str, Any], value: str | bytes | None) -> None:
+        data_key = self.key_builder.build(key, 'data')
+        self._invalidate(data_key)
+        if self._subscribed:
+            self.cache.set(data_key, strip_none(data), len(value or b''))
+
+    def _begin_load(self, redis_key: str) -> None:
+        self._loading[redis_key] = self._loading.get(redis_key, 0) + 1
+
+    def _end_load(self, redis_key: str) -> bool:
+        # A load that overlapped an invalidation may have read the old value, so it is not cached
+        stale = redis_key in self._stale or not self._subscribed
+
+        self._loading[redis_key] -= 1
+        if not self._loading[redis_key]:
+            del self._loading[redis_key]
+            self._stale.discard(redis_key)
+
+        return stale
+
+    def _invalidate(self, redis_key: str) -> None:
+        self.cache.invalidate(redis_key)
+        if redis_key in self._loading:
+            self._stale.add(redis_key)
+
+    def _handle_message(self, data: bytes | str) -> None:
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        origin, *redis_keys = data.split(' ')
+        if origin == self._origin:
+            return
+
+        for redis_key in redis_keys:
+            self._invalidate(redis_key)
+
+    def _reset(self, subscribed: bool) -> None:
+        self._subscribed = subscribed
+        self._stale.update(self._loading)
+        self.cache.clear()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    try:
+                        await pubsub.subscribe(self.channel)
+                        # Invalidations published while we were not subscribed are lost, so start empty
+                        self._reset(subscribed=True)
+
+                        async for message in pubsub.listen():
+                            if message['type'] == 'message':
+                                self._handle_message(message['data'])
+                    finally:
+                        self._reset(subscribed=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('FSM invalidation subscription failed: %s, retrying in %ss', e, self.reconnect_delay)
+                await asyncio.sleep(self.reconnect_delay)
@@ -1,18 +1,18 @@
 import logging
+from datetime import date
 
-from aiogram import Router
-from aiogram.types import Message
+from aiogram import Bot, Router
+from aiogram.types import Document, Message
 from aiogram.filters import Command, CommandObject
 from app.bot.enums.roles import UserRole
 from app.bot.filters.filters import UserRoleFilter
-from app.infrastructure.database.db import (
-    change_user_banned_status_by_id,
-    change_user_banned_status_by_username,
-    get_statistics,
-    get_user_banned_status_by_id,
-    get_user_banned_status_by_username
-)
-from psycopg import AsyncConnection
+from app.bot.services.active_users import ActiveUsersCounter
+from app.bot.services.broadcast import Broadcaster, shift_entities
+from app.bot.services.moderation import BanTargets, parse_ban_targets, set_banned_status
+from app.infrastructure.database.banned_users import BannedUsersRegistry
+from app.infrastructure.database.db import get_statistics
+from app.infrastructure.database.lazy_connection import LazyConnection
+from app.infrastructure.database.user_context import UserContext
 
 
 logger = logging.getLogger(__name__)
@@ -30,51 +30,112 @@ async def process_admin_help_command(message: Message, i18n: dict[str, str]):
 @admin_router.message(Command(commands='statistics'))
 async def process_statistics_command(
     message: Message,
-    conn: AsyncConnection,
+    command: CommandObject,
+    conn: LazyConnection,
     i18n: dict[str, str],
+    active_users: ActiveUsersCounter,
 ):
+    if command.args:
+        # /statistics YYYY-MM-DD [YYYY-MM-DD]: distinct active users over the range
+        try:
+            days = [date.fromisoformat(arg) for arg in command.args.split()]
+        except ValueError:
+            days = []
+        # Only days still kept in Redis are counted, anything else is cut off
+        days = active_users.clamp(days[0], days[-1]) if 1 <= len(days) <= 2 else None
+        if days is None:
+            await message.answer(text=i18n.get('incorrect_statistics_arg'))
+            return
+
+        count = await active_users.count(*days)
+        await message.answer(text=i18n.get('active_users_range').format(days[0], days[1], count))
+        return
+
     stat = await get_statistics(conn)
+    await conn.release()
+    dau, wau, mau = await active_users.dau_wau_mau()
     await message.answer(
         text=i18n.get('statistics').format(
             '\n'.join(
                 f'{i}. <b>{s[0]}</b>: {s[1]}'
-                for i, s in enumerate(stat, 1)
+                for i, s in enumerate(stat or [], 1)
             )
-        )
+        ) + '\n\n' + i18n.get('active_users').format(dau, wau, mau)
     )
 
 
+# A plain list of ids is about 11 bytes per user
+MAX_BAN_LIST_BYTES = 2 * 1024 * 1024
+
+
+def get_ban_list_document(message: Message) -> Document | None:
+    # Sent with the command as its caption, or replied to with the command
+    if message.document is not None:
+        return message.document
+    if message.reply_to_message is not None:
+        return message.reply_to_message.document
+    return None
+
+
+async def read_ban_targets(
+    message: Message,
+    command: CommandObject,
+    bot: Bot,
+    i18n: dict[str, str],
+    action: str,
+) -> BanTargets | None:
+    document = get_ban_list_document(message)
+
+    if document is not None:
+        if document.file_size and document.file_size > MAX_BAN_LIST_BYTES:
+            await message.answer(text=i18n.get('ban_list_too_large').format(MAX_BAN_LIST_BYTES // 1024))
+            return None
+        content = await bot.download(document)
+        targets = parse_ban_targets(content.getvalue().decode('utf-8', errors='replace'))
+    elif not command.args:
+        await message.answer(text=i18n.get(f'empty_{action}_answer'))
+        return None
+    else:
+        targets = parse_ban_targets(command.args)
+        if targets.invalid:
+            await message.answer(text=i18n.get(f'incorrect_{action}_arg'))
+            return None
+
+    if not targets:
+        await message.answer(text=i18n.get(f'incorrect_{action}_arg'))
+        return None
+
+    return targets
+
+
 @admin_router.message(Command(commands='ban'))
 async def process_ban_command(
     message: Message,
     command: CommandObject,
-    conn: AsyncConnection,
+    bot: Bot,
+    conn: LazyConnection,
     i18n: dict[str, str],
+    banned_users: BannedUsersRegistry,
 ):
-    args = command.args
-
-    if not args:
-        await message.answer(text=i18n.get('empty_ban_answer'))
+    targets = await read_ban_targets(message, command, bot, i18n, 'ban')
+    if targets is None:
         return
 
-    arg_user = args.split()[0].strip()
+    result = await set_banned_status(conn, targets=targets, banned=True)
+    await conn.release()
+    await banned_users.update(result.changed, banned=True)
 
-    if arg_user.isdigit():
-        banned_status = await get_user_banned_status_by_id(conn, user_id=int(arg_user))
-    elif arg_user.startswith('@'):
-        banned_status = await get_user_banned_status_by_username(conn, username=arg_user[1:])
-    else:
-        await message.answer(text=i18n.get('incorrect_bat_arg'))
-
-    if banned_status is None:
+    if len(targets) > 1 or targets.invalid:
+        await message.answer(
+            text=i18n.get('ban_summary').format(
+                len(result.changed), len(result.unchanged), len(result.unknown) + len(targets.invalid)
+            )
+        )
+    elif result.unknown:
         await message.answer(text=i18n.get('no_user'))
-    elif banned_status:
+    elif result.unchanged:
         await message.answer(text=i18n.get('already_banned'))
     else:
-        if arg_user.isdigit():
-            await change_user_banned_status_by_id(conn, user_id=int(arg_user), banned=True)
-        else:
-            await change_user_banned_status_by_username(conn, username=arg_user[1:], banned=True)
         await message.answer(text=i18n.get('successfully_banned'))
 
 
@@ -82,31 +143,59 @@ async def process_ban_command(
 async def process_unban_command(
     message: Message,
     command: CommandObject,
-    conn: AsyncConnection,
+    bot: Bot,
+    conn: LazyConnection,
     i18n: dict[str, str],
+    banned_users: BannedUsersRegistry,
 ):
-    args = command.args
-
-    if not args:
-        await message.answer(text=i18n.get('empty_unban_answer'))
+    targets = await read_ban_targets(message, command, bot, i18n, 'unban')
+    if targets is None:
         return
 
-    arg_user = args.split()[0].strip()
+    result = await set_banned_status(conn, targets=targets, banned=False)
+    await conn.release()
+    await banned_users.update(result.changed, banned=False)
 
-    if arg_user.isdigit():
-        banned_status = await get_user_banned_status_by_id(conn, user_id=int(arg_user))
-    elif arg_user.startswith('@'):
-        banned_status = await get_user_banned_status_by_username(conn, username=arg_user[1:])
-    else:
-        await message.answer(text=i18n.get('incorrect_unban_arg'))
-
-    if banned_status is None:
+    if len(targets) > 1 or targets.invalid:
+        await message.answer(
+            text=i18n.get('unban_summary').format(
+                len(result.changed), len(result.unchanged), len(result.unknown) + len(targets.invalid)
+            )
+        )
+    elif result.unknown:
         await message.answer(text=i18n.get('no_user'))
-    elif banned_status:
-        if arg_user.isdigit():
-            await change_user_banned_status_by_id(conn, user_id=int(arg_user), banned=False)
-        else:
-            await change_user_banned_status_by_username(conn, username=arg_user[1:], banned=False)
+    elif result.unchanged:
+        await message.answer(text=i18n.get('not_banned'))
+    else:
         await message.answer(text=i18n.get('successfully_unbanned'))
+
+
+@admin_router.message(Command(commands='broadcast'))
+async def process_broadcast_command(
+    message: Message,
+    command: CommandObject,
+    i18n: dict[str, str],
+    broadcaster: Broadcaster,
+    user_context: UserContext | None,
+):
+    language = user_context.language if user_context else message.from_user.language_code
+
+    if message.reply_to_message:
+        broadcast_id = await broadcaster.start(
+            admin_id=message.from_user.id,
+            language=language,
+            from_chat_id=message.chat.id,
+            message_id=message.reply_to_message.message_id,
+        )
+    elif command.args:
+        broadcast_id = await broadcaster.start(
+            admin_id=message.from_user.id,
+            language=language,
+            text=command.args,
+            entities=shift_entities(message.text, message.entities, command.args),
+        )
     else:
-        await message.answer(text=i18n.get('not_banned'))
+        await message.answer(text=i18n.get('empty_broadcast_answer'))
+        return
+
+    await message.answer(text=i18n.get('broadcast_started').format(broadcast_id))
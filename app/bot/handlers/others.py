@@ -1,18 +1,25 @@
-from aiogram import Router
+from aiogram import F, Router
 from aiogram.types import Message
-from psycopg import AsyncConnection
+from app.bot.services.media_groups import MediaGroupEchoBuffer
 
 
 others_router = Router()
 
 
+@others_router.message(F.media_group_id)
+async def send_media_group_echo(
+    message: Message,
+    media_groups: MediaGroupEchoBuffer,
+):
+    media_groups.add(message, chat_id=message.from_user.id)
+
+
 @others_router.message()
 async def send_echo(
     message: Message,
-    conn: AsyncConnection,
     i18n: dict[str, str],
 ):
     try:
         await message.send_copy(chat_id=message.from_user.id)
     except TypeError:
-        await message.reply(text=i18n.get('no_echo'))
\ No newline at end of file
+        await message.reply(text=i18n.get('no_echo'))
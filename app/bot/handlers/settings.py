@@ -2,21 +2,17 @@ import logging
 from contextlib import suppress
 
 from aiogram import Bot, Router, F
-from aiogram.types import CallbackQuery, Message, BotCommandScopeChat
+from aiogram.types import CallbackQuery, Message
 from aiogram.filters import Command, CommandStart, StateFilter
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from aiogram.enums import BotCommandScopeType
 from app.bot.filters.filters import LocaleFilter
-from app.bot.keyboards.keyboards import get_lang_settings_kb
-from app.bot.keyboards.menu_button import get_main_menu_commands
+from app.bot.keyboards.ui_cache import UICache
+from app.bot.services.menu_sync import MenuSynchronizer
 from app.bot.states.states import LangSG
-from app.infrastructure.database.db import (
-    get_user_lang,
-    get_user_role,
-    update_user_lang,
-)
-from psycopg import AsyncConnection
+from app.infrastructure.database.db import update_user_lang
+from app.infrastructure.database.lazy_connection import LazyConnection
+from app.infrastructure.database.user_context import UserContext
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +24,9 @@ async def procces_any_message_when_lang(
     message: Message,
     bot: Bot,
     i18n: dict[str, str],
+    locale: str,
     state: FSMContext,
-    locales: list[str],
+    ui: UICache,
 ):
     user_id = message.from_user.id
     data = await state.get_data()
@@ -42,7 +39,7 @@ async def procces_any_message_when_lang(
 
     msg = await message.answer(
         text=i18n.get('/lang'),
-        reply_markup=get_lang_settings_kb(i18n=i18n, locales=locales, checked=user_lang)
+        reply_markup=ui.lang_settings_kb(locale=locale, checked=user_lang)
     )
 
     await state.update_data(lang_settings_msg_id=msg.message_id)
@@ -52,17 +49,18 @@ async def procces_any_message_when_lang(
 @settings_router.message(Command(commands='lang'))
 async def procces_lang_command(
     message: Message,
-    conn: AsyncConnection,
     i18n: dict[str, str],
+    locale: str,
     state: FSMContext,
-    locales: list[str],
+    ui: UICache,
+    user_context: UserContext | None,
 ):
     await state.set_state(LangSG.lang)
-    user_lang = await get_user_lang(conn, user_id=message.from_user.id)
+    user_lang = user_context.language if user_context else None
 
     msg = await message.answer(
         text=i18n.get('/lang'),
-        reply_markup=get_lang_settings_kb(i18n=i18n, locales=locales, checked=user_lang),
+        reply_markup=ui.lang_settings_kb(locale=locale, checked=user_lang),
     )
 
     await state.update_data(lang_settings_msg_id=msg.message_id, user_lang=user_lang)
@@ -71,24 +69,21 @@ async def procces_lang_command(
 @settings_router.callback_query(F.data == 'save_lang_button_data')
 async def process_save_click(
     callback: CallbackQuery,
-    bot: Bot,
-    conn: AsyncConnection,
+    conn: LazyConnection,
     i18n: dict[str, str],
+    locale: str,
     state: FSMContext,
+    menu: MenuSynchronizer,
+    user_context: UserContext | None,
 ):
     data = await state.get_data()
     await update_user_lang(conn, user_id=callback.from_user.id, lang=data.get('user_lang'))
+    await conn.release()
 
     await callback.message.edit_text(text=i18n.get('lang_saved'))
 
-    user_role = await get_user_role(conn, user_id=callback.from_user.id)
-    await bot.set_my_commands(
-        commands=get_main_menu_commands(i18n=i18n, role=user_role),
-        scope=BotCommandScopeChat(
-            type=BotCommandScopeType.CHAT,
-            chat_id=callback.from_user.id,
-        ),
-    )
+    user_role = user_context.role if user_context else None
+    await menu.sync(chat_id=callback.from_user.id, locale=locale, role=user_role)
 
     await state.update_data(lang_settings_msg_id=None, user_lang=None)
     await state.set_state()
@@ -97,11 +92,11 @@ async def process_save_click(
 @settings_router.callback_query(F.data == 'cancel_lang_button_data')
 async def process_cancel_click(
     callback: CallbackQuery,
-    conn: AsyncConnection,
     i18n: dict[str, str],
     state: FSMContext,
+    user_context: UserContext | None,
 ):
-    user_lang = await get_user_lang(conn, user_id=callback.from_user.id)
+    user_lang = user_context.language if user_context else None
     await callback.message.edit_text(text=i18n.get('lang_cancelled').format(i18n.get(user_lang)))
     await state.update_data(lang_settings_msg_id=None, user_lang=None)
     await state.set_state()
@@ -111,12 +106,13 @@ async def process_cancel_click(
 async def process_lang_click(
     callback: CallbackQuery,
     i18n: dict[str, str],
-    locales: list[str],
+    locale: str,
+    ui: UICache,
 ):
     try:
         await callback.message.edit_text(
             text=i18n.get('/lang'),
-            reply_markup=get_lang_settings_kb(i18n=i18n, locales=locales, checked=callback.data)
+            reply_markup=ui.lang_settings_kb(locale=locale, checked=callback.data)
         )
     except TelegramBadRequest:
         await callback.answer()
\ No newline at end of file
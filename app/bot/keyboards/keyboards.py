@@ -1,41 +1,40 @@
+from typing import Iterable
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 
-def get_lang_settings_kb(i18n: dict[str, str], locales: list[str], checked: str) -> InlineKeyboardMarkup:
-    buttons = []
-    for locale  in sorted(locales):
-        if locale == 'default':
-            continue
-        if locale == checked:
-            buttons.append(
-                [
-                    InlineKeyboardButton(
-                        text=f'   {i18n.get(locale)}',
-                        callback_data=locale,
-                    )
-                ]
-            )
-        else:
-             buttons.append(
-                [
-                    InlineKeyboardButton(
-                        text=f'   {i18n.get(locale)}',
-                        callback_data=locale,
-                    )
-                ]
-            )
-
-    buttons.append(
-        [
-            InlineKeyboardButton(
-                text=i18n.get('cancel_lang_button_text'),
-                callback_data='cancel_lang_button_data',
-            ),
-            InlineKeyboardButton(
-                text=i18n.get('save_lang_button_text'),
-                callback_data='save_lang_button_data',
-            )
-        ]
+def get_locale_button(i18n: dict[str, str], locale: str, checked: bool) -> InlineKeyboardButton:
+    if checked:
+        return InlineKeyboardButton(
+            text=f'   {i18n.get(locale)}',
+            callback_data=locale,
+        )
+
+    return InlineKeyboardButton(
+        text=f'   {i18n.get(locale)}',
+        callback_data=locale,
     )
 
+
+def get_lang_control_buttons(i18n: dict[str, str]) -> list[InlineKeyboardButton]:
+    return [
+        InlineKeyboardButton(
+            text=i18n.get('cancel_lang_button_text'),
+            callback_data='cancel_lang_button_data',
+        ),
+        InlineKeyboardButton(
+            text=i18n.get('save_lang_button_text'),
+            callback_data='save_lang_button_data',
+        )
+    ]
+
+
+def get_lang_settings_kb(i18n: dict[str, str], locales: Iterable[str], checked: str | None) -> InlineKeyboardMarkup:
+    buttons = [
+        [get_locale_button(i18n=i18n, locale=locale, checked=locale == checked)]
+        for locale in sorted(locales)
+        if locale != 'default'
+    ]
+    buttons.append(get_lang_control_buttons(i18n))
+
     return InlineKeyboardMarkup(inline_keyboard=buttons)
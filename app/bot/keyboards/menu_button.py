@@ -14,6 +14,7 @@ def get_main_menu_commands(i18n: dict[str, str], role: UserRole) -> list[BotComm
             BotCommand(command='/ban', description=i18n.get('/ban_description')),
             BotCommand(command='/unban', description=i18n.get('/unban_description')),
             BotCommand(command='/statistics', description=i18n.get('/statistics_description')),
+            BotCommand(command='/broadcast', description=i18n.get('/broadcast_description')),
         ))
 
     return main_menu_commands
\ No newline at end of file
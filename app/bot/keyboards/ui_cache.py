@@ -0,0 +1,78 @@
+import hashlib
+import json
+from typing import Annotated
+
+from aiogram.types import BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
+from pydantic import ConfigDict, PlainSerializer
+from app.bot.enums.roles import UserRole
+from app.bot.keyboards.keyboards import get_lang_settings_kb
+from app.bot.keyboards.menu_button import get_main_menu_commands
+
+
+class FrozenInlineKeyboardButton(InlineKeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    # Cached keyboards are shared by every handler, so neither rows nor buttons may change.
+    # Rows go out as lists, the session only knows how to prepare those.
+    model_config = ConfigDict(frozen=True)
+
+    inline_keyboard: Annotated[
+        tuple[tuple[FrozenInlineKeyboardButton, ...], ...],
+        PlainSerializer(lambda rows: [list(row) for row in rows]),
+    ]
+
+
+def freeze_button(button: InlineKeyboardButton) -> FrozenInlineKeyboardButton:
+    return FrozenInlineKeyboardButton(**button.model_dump(exclude_none=True))
+
+
+def freeze_keyboard(keyboard: InlineKeyboardMarkup) -> FrozenInlineKeyboardMarkup:
+    return FrozenInlineKeyboardMarkup(
+        inline_keyboard=tuple(tuple(map(freeze_button, row)) for row in keyboard.inline_keyboard)
+    )
+
+
+class UICache:
+    def __init__(self, translations: dict):
+        self.default_locale: str = translations['default']
+        self.locales: frozenset[str] = frozenset(locale for locale in translations if locale != 'default')
+
+        ordered = sorted(self.locales)
+        self._lang_settings_kbs: dict[tuple[str, str | None], FrozenInlineKeyboardMarkup] = {}
+        self._main_menu_commands: dict[tuple[str, bool], tuple[BotCommand, ...]] = {}
+
+        for locale in ordered:
+            i18n = translations[locale]
+
+            # Built once per locale and checked locale, the layout itself lives in keyboards.py
+            for checked_locale in (None, *ordered):
+                self._lang_settings_kbs[locale, checked_locale] = freeze_keyboard(
+                    get_lang_settings_kb(i18n=i18n, locales=ordered, checked=checked_locale)
+                )
+
+            for is_admin in (False, True):
+                self._main_menu_commands[locale, is_admin] = tuple(
+                    get_main_menu_commands(i18n=i18n, role=UserRole.ADMIN if is_admin else UserRole.USER)
+                )
+
+        # Changes whenever menu_button.py or a command description changes
+        self.commands_version: str = hashlib.sha1(
+            json.dumps(
+                [
+                    [locale, is_admin, [[command.command, command.description] for command in commands]]
+                    for (locale, is_admin), commands in sorted(self._main_menu_commands.items())
+                ],
+                ensure_ascii=False,
+            ).encode()
+        ).hexdigest()[:8]
+
+    def resolve(self, locale: str | None) -> str:
+        return locale if locale in self.locales else self.default_locale
+
+    def lang_settings_kb(self, locale: str | None, checked: str | None) -> FrozenInlineKeyboardMarkup:
+        return self._lang_settings_kbs[self.resolve(locale), checked if checked in self.locales else None]
+
+    def main_menu_commands(self, locale: str | None, role: UserRole | None) -> tuple[BotCommand, ...]:
+        return self._main_menu_commands[self.resolve(locale), role == UserRole.ADMIN]
@@ -3,6 +3,7 @@ from typing import Any, Callable, Awaitable
 
 from aiogram import BaseMiddleware
 from aiogram.types import Update
+from app.infrastructure.database.lazy_connection import LazyConnection
 from psycopg_pool import AsyncConnectionPool
 
 
@@ -22,13 +23,17 @@ class DataBaseMiddleware(BaseMiddleware):
             logger.warning('Database pool is not provided in middleware data')
             raise RuntimeError('Missing db_pool in middleware context')
 
-        async with db_pool.connection() as connection:
-            try:
-                async with connection.transaction():
-                    data['conn'] = connection
-                    res = await handler(event, data)
-            except Exception as e:
-                logger.exception(f'Transaction rolled back due to error: {e}')
-                raise
-
-        return res
\ No newline at end of file
+        conn = LazyConnection(db_pool)
+        data['conn'] = conn
+
+        error: BaseException | None = None
+        try:
+            return await handler(event, data)
+        except BaseException as e:
+            # CancelledError included, otherwise the connection never goes back to the pool
+            error = e
+            if conn.acquired and isinstance(e, Exception):
+                logger.exception('Transaction rolled back due to error: %s', e)
+            raise
+        finally:
+            await conn.release(error)
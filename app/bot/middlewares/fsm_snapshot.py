@@ -0,0 +1,35 @@
+import logging
+from typing import Any, Callable, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject
+from app.bot.fsm.context import BufferedFSMContext
+
+
+logger = logging.getLogger(__name__)
+
+
+class FSMSnapshotMiddleware(BaseMiddleware):
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+    ) -> Any:
+        state: FSMContext | None = data.get('state')
+        if state is None:
+            return await handler(event, data)
+
+        # raw_state was already read by FSMContextMiddleware, so the state costs no extra round trip
+        buffered_state = BufferedFSMContext(
+            storage=state.storage,
+            key=state.key,
+            state=data.get('raw_state'),
+        )
+        data['state'] = buffered_state
+
+        try:
+            return await handler(event, data)
+        finally:
+            await buffered_state.flush()
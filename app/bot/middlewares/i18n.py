@@ -4,8 +4,7 @@ from typing import Any, Callable, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, User
 from aiogram.fsm.context import FSMContext
-from app.infrastructure.database.db import get_user_lang
-from psycopg import AsyncConnection
+from app.infrastructure.database.user_context import UserContext
 
 
 logger = logging.getLogger(__name__)
@@ -26,23 +25,21 @@ class TranslatorMiddleware(BaseMiddleware):
         user_context_data = await state.get_data()
 
         if (user_lang := user_context_data.get('user_lang')) is None:
-            conn: AsyncConnection = data.get('conn')
+            user_context: UserContext | None = data.get('user_context')
 
-            if conn is None:
-                logger.error('Database connection not found in middleware data')
-                raise RuntimeError('Missing database connection for detecting the user"s language')
-
-            user_lang = await get_user_lang(conn, user_id=user.id)
-
-            if user_lang is None:
+            if user_context is None:
                 user_lang = user.language_code
+            else:
+                user_lang = user_context.language
 
         translations: dict = data.get('translations')
         i18n: dict = translations.get(user_lang)
 
         if i18n is None:
+            data['locale'] = translations['default']
             data['i18n'] = translations[translations['default']]
         else:
+            data['locale'] = user_lang
             data['i18n'] = i18n
 
         return await handler(event, data)
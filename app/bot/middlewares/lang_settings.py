@@ -23,7 +23,7 @@ class LangSettingsMiddleware(BaseMiddleware):
         if event.callback_query is None:
             return await handler(event, data)
 
-        locales: list[str] = data.get('locales')
+        locales: frozenset[str] = data.get('locales')
 
         state: FSMContext = data.get('state')
         user_context_data: dict = await state.get_data()
@@ -0,0 +1,79 @@
+import time
+from typing import Any, Callable, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject, Update
+from app.infrastructure.metrics import (
+    HANDLER_ERRORS,
+    HANDLER_SECONDS,
+    MIDDLEWARE_SECONDS,
+    UPDATE_SECONDS,
+    UPDATES,
+)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: Update,
+            data: dict[str, Any]
+    ) -> Any:
+        labels = (event.event_type,)
+        UPDATES.inc(labels)
+
+        started_at = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_SECONDS.observe(labels, time.perf_counter() - started_at)
+
+
+class TimedMiddleware(BaseMiddleware):
+    # Records only the wrapped middleware's own time, the rest of the chain is subtracted
+    def __init__(self, middleware: BaseMiddleware):
+        self.middleware = middleware
+        self.labels = (type(middleware).__name__,)
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+    ) -> Any:
+        inner = 0.0
+
+        async def timed_handler(event: TelegramObject, data: dict[str, Any]) -> Any:
+            nonlocal inner
+            started_at = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                inner += time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            MIDDLEWARE_SECONDS.observe(self.labels, time.perf_counter() - started_at - inner)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+    ) -> Any:
+        handler_object: HandlerObject | None = data.get('handler')
+        labels = (handler_object.callback.__name__ if handler_object else 'unknown',)
+
+        started_at = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(labels)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(labels, time.perf_counter() - started_at)
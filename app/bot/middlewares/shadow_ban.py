@@ -3,8 +3,7 @@ from typing import Any, Callable, Awaitable
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Update, User
-from app.infrastructure.database.db import get_user_banned_status_by_id
-from psycopg import AsyncConnection
+from app.infrastructure.database.banned_users import BannedUsersRegistry
 
 
 logger = logging.getLogger(__name__)
@@ -22,15 +21,13 @@ class SwadowBanMiddleware(BaseMiddleware):
         if user is None:
             return await handler(event, data)
 
-        conn: AsyncConnection = data.get('conn')
-        if conn is None:
-            logger.warning('Database connection not found in middleware data')
-            raise RuntimeError('Missing database connection for shadowban check')
+        banned_users: BannedUsersRegistry = data.get('banned_users')
+        if banned_users is None:
+            logger.warning('Banned users registry not found in middleware data')
+            raise RuntimeError('Missing banned users registry for shadowban check')
 
-        user_banned_status = await get_user_banned_status_by_id(conn, user_id=user.id)
-
-        if user_banned_status:
-            logger.warning(f'Shadow-banned user tried to interact: {user.id}')
+        if user.id in banned_users:
+            logger.warning('Shadow-banned user tried to interact: %s', user.id)
             if event.callback_query:
                 await event.callback_query.answer()
             return
@@ -3,8 +3,8 @@ from typing import Any, Callable, Awaitable
 
 from aiogram import BaseMiddleware
 from aiogram.types import Update, User
-from app.infrastructure.database.db import add_user_activity
-from psycopg import AsyncConnection
+from app.bot.services.active_users import ActiveUsersCounter
+from app.infrastructure.database.activity import ActivityAggregator
 
 
 logger = logging.getLogger(__name__)
@@ -23,11 +23,17 @@ class ActivityCounterMiddleware(BaseMiddleware):
 
         res = await handler(event, data)
 
-        conn: AsyncConnection = data.get('conn')
-        if conn is None:
-            logger.warning('No database connection found in middleware data')
-            raise RuntimeError('Missing database connection for activity logging')
+        activity_aggregator: ActivityAggregator = data.get('activity_aggregator')
+        if activity_aggregator is None:
+            logger.warning('No activity aggregator found in middleware data')
+            raise RuntimeError('Missing activity aggregator for activity logging')
 
-        await add_user_activity(conn, user_id=user.id)
+        active_users: ActiveUsersCounter = data.get('active_users')
+        if active_users is None:
+            logger.warning('No active users counter found in middleware data')
+            raise RuntimeError('Missing active users counter for activity logging')
+
+        activity_aggregator.add(user.id)
+        active_users.add(user.id)
 
         return res
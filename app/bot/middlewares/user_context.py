@@ -0,0 +1,41 @@
+import logging
+from typing import Any, Callable, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+from app.infrastructure.database.db import update_username
+from app.infrastructure.database.lazy_connection import LazyConnection
+from app.infrastructure.database.user_context import get_user_context
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserContextLoaderMiddleware(BaseMiddleware):
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+    ) -> Any:
+        user: User = data.get('event_from_user')
+        if user is None:
+            data['user_context'] = None
+            return await handler(event, data)
+
+        conn: LazyConnection = data.get('conn')
+        if conn is None:
+            logger.error('Database connection not found in middleware data')
+            raise RuntimeError('Missing database connection for loading the user context')
+
+        acquired = conn.acquired
+        user_context = data['user_context'] = await get_user_context(conn, user_id=user.id)
+
+        # Compared in memory, so only an actual change costs a write
+        if user_context is not None and user_context.username != user.username:
+            await update_username(conn, user_id=user.id, username=user.username)
+
+        if not acquired:
+            await conn.release()
+
+        return await handler(event, data)
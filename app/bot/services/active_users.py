@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import date, timedelta
+
+from redis.asyncio import Redis
+
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_USERS_PREFIX = 'active_users'
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+class ActiveUsersCounter:
+    # Distinct active users per day in Redis HyperLogLogs, about 0.81% standard error in 12 KB a day.
+    # Ids are collected in memory and sent with one pipeline per flush, the update path never waits for Redis.
+    def __init__(
+            self,
+            redis: Redis,
+            prefix: str = ACTIVE_USERS_PREFIX,
+            ttl_days: int = 400,
+            flush_interval: float = 5.0,
+            max_pending: int = 10_000,
+    ):
+        if ttl_days <= 0:
+            raise ValueError('ActiveUsersCounter: `ttl_days` must be positive')
+        if flush_interval <= 0:
+            raise ValueError('ActiveUsersCounter: `flush_interval` must be positive')
+        if max_pending <= 0:
+            raise ValueError('ActiveUsersCounter: `max_pending` must be positive')
+
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl_days = ttl_days
+        self.ttl = ttl_days * 86400
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: dict[date, set[int]] = {}
+        self._size = 0
+        self._flush_requested = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def day_key(self, day: date) -> str:
+        return f'{self.prefix}:d:{day.isoformat()}'
+
+    def month_key(self, month: date) -> str:
+        return f'{self.prefix}:m:{month:%Y-%m}'
+
+    def add(self, user_id: int, day: date | None = None) -> None:
+        user_ids = self._pending.setdefault(day or date.today(), set())
+        if user_id in user_ids:
+            return
+
+        user_ids.add(user_id)
+        self._size += 1
+        if self._size >= self.max_pending:
+            self._flush_requested.set()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+
+        pending, self._pending, self._size = self._pending, {}, 0
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for day, user_ids in pending.items():
+                    pipe.pfadd(self.day_key(day), *user_ids)
+                    pipe.expire(self.day_key(day), self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            # Statistics only, a lost batch is not worth holding memory for
+            logger.warning('Failed to flush %s active users: %s', sum(map(len, pending.values())), e)
+
+    def clamp(self, first_day: date, last_day: date) -> tuple[date, date] | None:
+        # Days past the TTL are gone and future days are empty, so the range never walks over them
+        today = date.today()
+        first_day = max(first_day, today - timedelta(days=self.ttl_days - 1))
+        last_day = min(last_day, today)
+        if first_day > last_day:
+            return None
+        return first_day, last_day
+
+    async def count(self, first_day: date, last_day: date) -> int:
+        days = self.clamp(first_day, last_day)
+        if days is None:
+            return 0
+        first_day, last_day = days
+
+        keys = []
+        day = first_day
+        while day <= last_day:
+            # Months that ended before yesterday no longer change, so they are merged once and reused
+            end = next_month(day)
+            if day == month_start(day) and end - timedelta(days=1) <= last_day and end < date.today():
+                keys.append(await self._merged_month(day))
+                day = end
+            else:
+                keys.append(self.day_key(day))
+                day += timedelta(days=1)
+
+        if not keys:
+            return 0
+        return await self.redis.pfcount(*keys)
+
+    async def dau_wau_mau(self) -> tuple[int, int, int]:
+        today = date.today()
+        return (
+            await self.count(today, today),
+            await self.count(today - timedelta(days=6), today),
+            await self.count(today - timedelta(days=29), today),
+        )
+
+    async def _merged_month(self, month: date) -> str:
+        key = self.month_key(month)
+        if not await self.redis.exists(key):
+            days = (next_month(month) - month).days
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.pfmerge(key, *(self.day_key(month + timedelta(days=offset)) for offset in range(days)))
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        return key
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._closing = True
+        if self._task is not None:
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+        logger.info('Active users counter stopped')
+
+    async def _run(self) -> None:
+        while not self._closing:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            self._flush_requested.clear()
+            await self.flush()
@@ -0,0 +1,299 @@
+import asyncio
+import json
+import logging
+import secrets
+from contextlib import suppress
+from dataclasses import asdict, dataclass, fields
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import MessageEntity
+from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool
+from redis.asyncio import Redis
+from app.bot.services.leases import ACQUIRE_LEASE, REFRESH_LEASE, RELEASE_LEASE
+from app.bot.services.outbound import bulk_traffic
+from app.bot.services.rate_limiter import TokenBucket
+from app.infrastructure.database.db import change_users_alive_status, iter_alive_user_ids
+from app.infrastructure.database.lazy_connection import LazyConnection
+
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_BROADCASTS_KEY = 'broadcasts:active'
+
+
+def shift_entities(text: str, entities: list[MessageEntity] | None, args: str) -> list[MessageEntity]:
+    # Entities of `/broadcast <args>` re-based onto the args, Telegram counts offsets in UTF-16 code units
+    start = len(text[:len(text) - len(args)].encode('utf-16-le')) // 2
+    return [
+        entity.model_copy(update={'offset': entity.offset - start})
+        for entity in entities or ()
+        if entity.offset >= start
+    ]
+
+
+@dataclass
+class BroadcastJob:
+    id: str
+    admin_id: int
+    language: str
+    from_chat_id: int = 0
+    message_id: int = 0
+    text: str = ''
+    # JSON list of the admin's formatting entities, the text is sent without a parse mode
+    entities: str = ''
+    last_user_id: int = 0
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+
+    @property
+    def key(self) -> str:
+        return f'broadcast:{self.id}'
+
+    @property
+    def lease_key(self) -> str:
+        return f'broadcast:{self.id}:lease'
+
+    @classmethod
+    def from_redis(cls, raw: dict[bytes, bytes]) -> 'BroadcastJob':
+        values = {key.decode(): value.decode() for key, value in raw.items()}
+        kwargs = {}
+        for field in fields(cls):
+            if field.name in values:
+                kwargs[field.name] = int(values[field.name]) if field.type is int else values[field.name]
+        return cls(**kwargs)
+
+
+class Broadcaster:
+    def __init__(
+            self,
+            bot: Bot,
+            redis: Redis,
+            db_pool: AsyncConnectionPool,
+            conninfo: str,
+            translations: dict,
+            rate: float = 25.0,
+            dead_batch_size: int = 100,
+            lease_ttl: int = 300,
+            resume_interval: float = 60.0,
+    ):
+        self.bot = bot
+        self.redis = redis
+        self.db_pool = db_pool
+        self.conninfo = conninfo
+        self.translations = translations
+        self.dead_batch_size = dead_batch_size
+        self.lease_ttl = lease_ttl
+        self.resume_interval = resume_interval
+        self.window = max(1, int(rate))
+        self.limiter = TokenBucket(rate=rate)
+        self.owner = secrets.token_hex(8)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._resumer: asyncio.Task | None = None
+
+    async def start(
+            self,
+            *,
+            admin_id: int,
+            language: str,
+            from_chat_id: int = 0,
+            message_id: int = 0,
+            text: str = '',
+            entities: list[MessageEntity] | None = None,
+    ) -> str:
+        job = BroadcastJob(
+            id=secrets.token_hex(4),
+            admin_id=admin_id,
+            language=language,
+            from_chat_id=from_chat_id,
+            message_id=message_id,
+            text=text,
+            entities=json.dumps([entity.model_dump(exclude_none=True) for entity in entities or ()]),
+        )
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(job.key, mapping=asdict(job))
+            pipe.sadd(ACTIVE_BROADCASTS_KEY, job.id)
+            await pipe.execute()
+
+        await self._spawn(job)
+        logger.info('Broadcast %s started by admin %s', job.id, admin_id)
+
+        return job.id
+
+    async def resume_all(self) -> None:
+        for raw_id in await self.redis.smembers(ACTIVE_BROADCASTS_KEY):
+            broadcast_id = raw_id.decode()
+            raw = await self.redis.hgetall(f'broadcast:{broadcast_id}')
+            if not raw:
+                await self.redis.srem(ACTIVE_BROADCASTS_KEY, broadcast_id)
+                continue
+
+            job = BroadcastJob.from_redis(raw)
+            if await self._spawn(job):
+                logger.info('Broadcast %s resumed after user %s', job.id, job.last_user_id)
+
+    def start_resuming(self) -> None:
+        # Picks up broadcasts whose lease expired after a crash and the ones that failed here
+        if self._resumer is None:
+            self._resumer = asyncio.create_task(self._resume_periodically())
+
+    async def _resume_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.resume_interval)
+            try:
+                await self.resume_all()
+            except Exception as e:
+                logger.warning('Failed to resume broadcasts: %s', e)
+
+    async def stop(self) -> None:
+        if self._resumer is not None:
+            self._resumer.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._resumer
+            self._resumer = None
+
+        for task in self._tasks.values():
+            task.cancel()
+        for task in list(self._tasks.values()):
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks.clear()
+
+    async def _spawn(self, job: BroadcastJob) -> bool:
+        # The lease keeps several bot replicas from resuming the same broadcast
+        if job.id in self._tasks or not await self.redis.eval(
+                ACQUIRE_LEASE, 1, job.lease_key, self.owner, self.lease_ttl
+        ):
+            return False
+
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return True
+
+    async def _run(self, job: BroadcastJob) -> None:
+        # Interactive replies go out first while a broadcast is running
+        with bulk_traffic():
+            await self._deliver_all(job)
+
+    async def _deliver_all(self, job: BroadcastJob) -> None:
+        dead_user_ids: list[int] = []
+        finished = False
+
+        try:
+            connection = await AsyncConnection.connect(conninfo=self.conninfo)
+            try:
+                window: list[int] = []
+                async for user_id in iter_alive_user_ids(connection, after_user_id=job.last_user_id):
+                    window.append(user_id)
+                    if len(window) >= self.window:
+                        await self._deliver_window(job, window, dead_user_ids)
+                        window = []
+                if window:
+                    await self._deliver_window(job, window, dead_user_ids)
+            finally:
+                await connection.close()
+
+            finished = True
+        except asyncio.CancelledError:
+            logger.info('Broadcast %s interrupted after user %s', job.id, job.last_user_id)
+            raise
+        except Exception as e:
+            logger.exception('Broadcast %s failed after user %s: %s', job.id, job.last_user_id, e)
+        finally:
+            await self._mark_dead(dead_user_ids)
+            # Unless finished, the lease is dropped so a restart or the next resume picks the job up right away
+            await self._checkpoint(job, finished=finished, release_lease=not finished)
+
+        if finished:
+            await self._report(job)
+
+    async def _deliver_window(self, job: BroadcastJob, user_ids: list[int], dead_user_ids: list[int]) -> None:
+        results = await asyncio.gather(*(self._deliver(job, user_id) for user_id in user_ids))
+
+        for user_id, result in zip(user_ids, results):
+            if result == 'sent':
+                job.sent += 1
+            elif result == 'blocked':
+                job.blocked += 1
+                dead_user_ids.append(user_id)
+            else:
+                job.failed += 1
+
+        job.last_user_id = user_ids[-1]
+
+        if len(dead_user_ids) >= self.dead_batch_size:
+            await self._mark_dead(dead_user_ids)
+        await self._checkpoint(job)
+
+    async def _deliver(self, job: BroadcastJob, user_id: int) -> str:
+        while True:
+            await self.limiter.acquire()
+            try:
+                if job.text:
+                    await self.bot.send_message(
+                        chat_id=user_id,
+                        text=job.text,
+                        entities=[MessageEntity(**entity) for entity in json.loads(job.entities or '[]')],
+                        parse_mode=None,
+                    )
+                else:
+                    await self.bot.copy_message(
+                        chat_id=user_id,
+                        from_chat_id=job.from_chat_id,
+                        message_id=job.message_id,
+                    )
+                return 'sent'
+            except TelegramRetryAfter as e:
+                logger.warning('Broadcast %s hit flood control, pausing for %ss', job.id, e.retry_after)
+                self.limiter.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return 'blocked'
+            except TelegramAPIError as e:
+                logger.warning('Broadcast %s failed to deliver to %s: %s', job.id, user_id, e)
+                return 'failed'
+
+    async def _mark_dead(self, dead_user_ids: list[int]) -> None:
+        if not dead_user_ids:
+            return
+
+        try:
+            async with LazyConnection(self.db_pool) as conn:
+                await change_users_alive_status(conn, user_ids=list(dead_user_ids), is_alive=False)
+            dead_user_ids.clear()
+        except Exception as e:
+            logger.warning('Failed to mark %s users as not alive: %s', len(dead_user_ids), e)
+
+    async def _checkpoint(
+            self,
+            job: BroadcastJob,
+            finished: bool = False,
+            release_lease: bool = False,
+    ) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if finished:
+                pipe.delete(job.key)
+                pipe.eval(RELEASE_LEASE, 1, job.lease_key, self.owner)
+                pipe.srem(ACTIVE_BROADCASTS_KEY, job.id)
+            else:
+                pipe.hset(job.key, mapping=asdict(job))
+                if release_lease:
+                    pipe.eval(RELEASE_LEASE, 1, job.lease_key, self.owner)
+                else:
+                    pipe.eval(REFRESH_LEASE, 1, job.lease_key, self.owner, self.lease_ttl)
+            await pipe.execute()
+
+    async def _report(self, job: BroadcastJob) -> None:
+        i18n = self.translations.get(job.language) or self.translations[self.translations['default']]
+        logger.info(
+            'Broadcast %s finished: sent=%s, blocked=%s, failed=%s', job.id, job.sent, job.blocked, job.failed
+        )
+
+        with suppress(TelegramAPIError):
+            await self.bot.send_message(
+                chat_id=job.admin_id,
+                text=i18n.get('broadcast_finished').format(job.id, job.sent, job.blocked, job.failed),
+            )
@@ -0,0 +1,21 @@
+# A lease holds the token of the process doing the job, only that process may extend or drop it.
+# KEYS[1] is the lease, ARGV[1] the owner token, ARGV[2] the TTL in seconds.
+ACQUIRE_LEASE = '''
+local owner = redis.call('get', KEYS[1])
+if not owner or owner == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0'''
+
+REFRESH_LEASE = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0'''
+
+RELEASE_LEASE = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0'''
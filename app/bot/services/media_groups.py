@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Message
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram albums hold at most 10 items
+MAX_GROUP_SIZE = 10
+
+
+class MediaGroup:
+    __slots__ = ('chat_id', 'from_chat_id', 'message_ids', 'timer')
+
+    def __init__(self, chat_id: int, from_chat_id: int):
+        self.chat_id = chat_id
+        self.from_chat_id = from_chat_id
+        self.message_ids: list[int] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class MediaGroupEchoBuffer:
+    # Telegram delivers every album item as its own update. They are collected until no new item
+    # has arrived for `window` seconds and echoed back with one copyMessages call, as one album.
+    def __init__(self, bot: Bot, window: float = 0.5, max_groups: int = 1000):
+        if window <= 0:
+            raise ValueError('MediaGroupEchoBuffer: `window` must be positive')
+        if max_groups <= 0:
+            raise ValueError('MediaGroupEchoBuffer: `max_groups` must be positive')
+
+        self.bot = bot
+        self.window = window
+        self.max_groups = max_groups
+        self._groups: OrderedDict[str, MediaGroup] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def add(self, message: Message, chat_id: int) -> None:
+        key = message.media_group_id
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = MediaGroup(chat_id=chat_id, from_chat_id=message.chat.id)
+            # Oldest albums go out early rather than letting the buffer grow
+            while len(self._groups) > self.max_groups:
+                self._flush_soon(next(iter(self._groups)))
+        elif group.timer is not None:
+            group.timer.cancel()
+
+        group.message_ids.append(message.message_id)
+        if len(group.message_ids) >= MAX_GROUP_SIZE:
+            self._flush_soon(key)
+        else:
+            group.timer = asyncio.get_running_loop().call_later(self.window, self._flush_soon, key)
+
+    def _flush_soon(self, key: str) -> None:
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+
+        task = asyncio.create_task(self._send(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, group: MediaGroup) -> None:
+        try:
+            await self.bot.copy_messages(
+                chat_id=group.chat_id,
+                from_chat_id=group.from_chat_id,
+                message_ids=sorted(group.message_ids),
+            )
+        except TelegramAPIError as e:
+            logger.warning(
+                'Failed to echo a media group of %s messages to %s: %s', len(group.message_ids), group.chat_id, e
+            )
+
+    async def stop(self) -> None:
+        for key in list(self._groups):
+            self._flush_soon(key)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info('Media group echo buffer stopped')
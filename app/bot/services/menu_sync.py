@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import secrets
+from contextlib import suppress
+
+from aiogram import Bot
+from aiogram.enums import BotCommandScopeType
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import BotCommandScopeChat
+from redis.asyncio import Redis
+from app.bot.enums.roles import UserRole
+from app.bot.keyboards.ui_cache import UICache
+from app.bot.services.leases import ACQUIRE_LEASE, REFRESH_LEASE, RELEASE_LEASE
+from app.bot.services.outbound import bulk_traffic
+from app.bot.services.rate_limiter import TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+MENU_FINGERPRINTS_KEY = 'menu:fingerprints'
+MENU_VERSION_KEY = 'menu:version'
+MENU_RESYNC_CURSOR_KEY = 'menu:resync:cursor'
+MENU_RESYNC_LEASE_KEY = 'menu:resync:lease'
+
+
+class MenuSynchronizer:
+    def __init__(
+            self,
+            bot: Bot,
+            redis: Redis,
+            ui: UICache,
+            rate: float = 10.0,
+            batch_size: int = 500,
+            lease_ttl: int = 300,
+            retry_interval: float = 60.0,
+    ):
+        self.bot = bot
+        self.redis = redis
+        self.ui = ui
+        self.batch_size = batch_size
+        self.lease_ttl = lease_ttl
+        self.retry_interval = retry_interval
+        self.limiter = TokenBucket(rate=rate)
+        self.owner = secrets.token_hex(8)
+        self._task: asyncio.Task | None = None
+
+    def fingerprint(self, locale: str | None, role: UserRole | None) -> str:
+        role = 'a' if role == UserRole.ADMIN else 'u'
+        return f'{self.ui.resolve(locale)}:{role}:{self.ui.commands_version}'
+
+    async def sync(self, chat_id: int, locale: str | None, role: UserRole | None) -> bool:
+        fingerprint = self.fingerprint(locale, role)
+        current = await self.redis.hget(MENU_FINGERPRINTS_KEY, chat_id)
+        if current is not None and current.decode() == fingerprint:
+            return False
+
+        await self._set_commands(chat_id, locale, role)
+        await self.redis.hset(MENU_FINGERPRINTS_KEY, chat_id, fingerprint)
+
+        return True
+
+    async def synced(self) -> bool:
+        version = await self.redis.get(MENU_VERSION_KEY)
+        return version is not None and version.decode() == self.ui.commands_version
+
+    async def start(self) -> None:
+        if await self.synced():
+            return
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _set_commands(self, chat_id: int, locale: str | None, role: UserRole | None) -> None:
+        await self.bot.set_my_commands(
+            commands=list(self.ui.main_menu_commands(locale=locale, role=role)),
+            scope=BotCommandScopeChat(
+                type=BotCommandScopeType.CHAT,
+                chat_id=chat_id,
+            ),
+        )
+
+    async def _run(self) -> None:
+        # Until some replica finishes: a holder that crashed leaves a lease that expires after lease_ttl
+        while True:
+            try:
+                with bulk_traffic():
+                    if await self._resync():
+                        return
+            except Exception as e:
+                logger.warning('Failed to re-sync chat menus: %s', e)
+            await asyncio.sleep(self.retry_interval)
+
+    async def _resync(self) -> bool:
+        if await self.synced():
+            return True
+
+        # The lease keeps several bot replicas from re-syncing the same chats
+        if not await self.redis.eval(ACQUIRE_LEASE, 1, MENU_RESYNC_LEASE_KEY, self.owner, self.lease_ttl):
+            return False
+
+        synced = dropped = 0
+        try:
+            raw_cursor = await self.redis.get(MENU_RESYNC_CURSOR_KEY)
+            cursor = int(raw_cursor) if raw_cursor else 0
+            logger.info('Re-syncing chat menus to version %s from cursor %s', self.ui.commands_version, cursor)
+
+            while True:
+                cursor, fingerprints = await self.redis.hscan(
+                    MENU_FINGERPRINTS_KEY, cursor=cursor, count=self.batch_size
+                )
+
+                # Past lease_ttl another replica may have taken over, then it carries on from the cursor
+                if not await self.redis.eval(REFRESH_LEASE, 1, MENU_RESYNC_LEASE_KEY, self.owner, self.lease_ttl):
+                    logger.warning('Chat menu re-sync lease lost after %s chats', synced)
+                    return False
+
+                for raw_chat_id, raw_fingerprint in fingerprints.items():
+                    locale, role, version = raw_fingerprint.decode().split(':')
+                    if version == self.ui.commands_version:
+                        continue
+
+                    chat_id = int(raw_chat_id)
+                    role = UserRole.ADMIN if role == 'a' else UserRole.USER
+                    if await self._resync_chat(chat_id, locale, role):
+                        synced += 1
+                    else:
+                        dropped += 1
+
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    if cursor:
+                        pipe.set(MENU_RESYNC_CURSOR_KEY, cursor)
+                    else:
+                        pipe.delete(MENU_RESYNC_CURSOR_KEY)
+                        pipe.set(MENU_VERSION_KEY, self.ui.commands_version)
+                    await pipe.execute()
+
+                if not cursor:
+                    break
+
+            logger.info('Chat menus re-synced: %s updated, %s dropped', synced, dropped)
+            return True
+        except asyncio.CancelledError:
+            logger.info('Chat menu re-sync interrupted after %s chats', synced)
+            raise
+        except Exception as e:
+            logger.exception('Chat menu re-sync failed after %s chats: %s', synced, e)
+            return False
+        finally:
+            with suppress(Exception):
+                await self.redis.eval(RELEASE_LEASE, 1, MENU_RESYNC_LEASE_KEY, self.owner)
+
+    async def _resync_chat(self, chat_id: int, locale: str, role: UserRole) -> bool:
+        while True:
+            await self.limiter.acquire()
+            try:
+                await self._set_commands(chat_id, locale, role)
+                await self.redis.hset(MENU_FINGERPRINTS_KEY, chat_id, self.fingerprint(locale, role))
+                return True
+            except TelegramRetryAfter as e:
+                logger.warning('Chat menu re-sync hit flood control, pausing for %ss', e.retry_after)
+                self.limiter.pause(e.retry_after)
+            except TelegramForbiddenError:
+                # The next /start syncs the menu again
+                await self.redis.hdel(MENU_FINGERPRINTS_KEY, chat_id)
+                return False
+            except TelegramAPIError as e:
+                logger.warning('Failed to re-sync the menu of chat %s: %s', chat_id, e)
+                return False
@@ -0,0 +1,99 @@
+import logging
+import re
+from dataclasses import dataclass, field
+
+import psycopg
+from app.infrastructure.database.db import set_users_banned_status_by_ids, set_users_banned_status_by_usernames
+
+
+logger = logging.getLogger(__name__)
+
+# Users per UPDATE ... WHERE user_id = ANY(...), keeps each statement and its row locks small
+BAN_CHUNK_SIZE = 1000
+
+# Telegram ids and usernames separated by whitespace, commas or semicolons, as in CSV and TXT exports
+SEPARATORS = re.compile(r'[\s,;]+')
+USERNAME = re.compile(r'@[A-Za-z0-9_]{4,32}')
+
+# user_id is a BIGINT column
+MAX_USER_ID = 2 ** 63 - 1
+
+
+@dataclass(slots=True)
+class BanTargets:
+    user_ids: list[int] = field(default_factory=list)
+    usernames: list[str] = field(default_factory=list)
+    invalid: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.user_ids) + len(self.usernames)
+
+
+@dataclass(slots=True)
+class BanResult:
+    # Users whose status was changed, users that already had it, arguments that matched nobody
+    changed: list[int] = field(default_factory=list)
+    unchanged: list[int] = field(default_factory=list)
+    unknown: list[str] = field(default_factory=list)
+
+
+def parse_ban_targets(text: str) -> BanTargets:
+    targets = BanTargets()
+    seen = set()
+
+    for token in SEPARATORS.split(text):
+        if not token or token.lower() in seen:
+            continue
+        seen.add(token.lower())
+
+        # str.isdigit() also accepts digits like `²` that int() rejects
+        if token.isascii() and token.isdigit() and int(token) <= MAX_USER_ID:
+            targets.user_ids.append(int(token))
+        elif USERNAME.fullmatch(token):
+            targets.usernames.append(token[1:])
+        else:
+            targets.invalid.append(token)
+
+    return targets
+
+
+async def set_banned_status(
+        conn: psycopg.AsyncConnection,
+        *,
+        targets: BanTargets,
+        banned: bool,
+        chunk_size: int = BAN_CHUNK_SIZE,
+) -> BanResult:
+    result = BanResult()
+    handled = set()
+
+    for i in range(0, len(targets.user_ids), chunk_size):
+        chunk = targets.user_ids[i:i + chunk_size]
+        rows = await set_users_banned_status_by_ids(conn, user_ids=chunk, banned=banned)
+
+        found = set()
+        for user_id, was_banned in rows:
+            found.add(user_id)
+            handled.add(user_id)
+            (result.unchanged if was_banned == banned else result.changed).append(user_id)
+        result.unknown.extend(str(user_id) for user_id in chunk if user_id not in found)
+
+    for i in range(0, len(targets.usernames), chunk_size):
+        chunk = targets.usernames[i:i + chunk_size]
+        rows = await set_users_banned_status_by_usernames(conn, usernames=chunk, banned=banned)
+
+        found = set()
+        for user_id, was_banned, username in rows:
+            found.add(username)
+            # The same user can be named by id and by username at once
+            if user_id in handled:
+                continue
+            handled.add(user_id)
+            (result.unchanged if was_banned == banned else result.changed).append(user_id)
+        result.unknown.extend(f'@{username}' for username in chunk if username.lower() not in found)
+
+    logger.info(
+        'Banned status set to %s: %s changed, %s unchanged, %s unknown',
+        banned, len(result.changed), len(result.unchanged), len(result.unknown),
+    )
+    return result
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Iterator
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from app.bot.services.rate_limiter import PriorityTokenBucket, TokenBucket
+from app.infrastructure.metrics import TELEGRAM_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+# Long polling and webhook management must never wait behind user traffic
+UNTHROTTLED_METHODS = frozenset({
+    'getUpdates',
+    'getMe',
+    'setWebhook',
+    'deleteWebhook',
+    'getWebhookInfo',
+    'logOut',
+    'close',
+})
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+_priority: ContextVar[Priority] = ContextVar('outbound_priority', default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def bulk_traffic() -> Iterator[None]:
+    token = _priority.set(Priority.BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class OutboundStats:
+    __slots__ = ('queued', 'requests', 'retries', 'wait_seconds', 'max_wait_seconds')
+
+    def __init__(self):
+        self.queued = 0
+        self.requests = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ThrottledSession(AiohttpSession):
+    def __init__(
+            self,
+            *,
+            rate: float = 30.0,
+            chat_rate: float = 1.0,
+            chat_burst: float = 3.0,
+            group_rate: float = 20 / 60,
+            max_chats: int = 10_000,
+            max_retries: int = 3,
+            **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_chats = max_chats
+        self.max_retries = max_retries
+        self.limiter = PriorityTokenBucket(rate=rate)
+        self.stats = {priority: OutboundStats() for priority in Priority}
+        self._chat_buckets: OrderedDict[int | str, TokenBucket] = OrderedDict()
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        return {priority.name.lower(): stats.as_dict() for priority, stats in self.stats.items()}
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Private chats have positive ids, groups and channels are limited much harder
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(rate=self.chat_rate, capacity=self.chat_burst)
+            else:
+                bucket = TokenBucket(rate=self.group_rate, capacity=self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+
+            while len(self._chat_buckets) > self.max_chats:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+
+        return bucket
+
+    async def _timed_request(
+            self,
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+            timeout: int | None = None,
+    ) -> TelegramType:
+        started_at = time.perf_counter()
+        try:
+            return await super().make_request(bot, method, timeout)
+        finally:
+            TELEGRAM_SECONDS.observe((method.__api_method__,), time.perf_counter() - started_at)
+
+    async def make_request(
+            self,
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+            timeout: int | None = None,
+    ) -> TelegramType:
+        if method.__api_method__ in UNTHROTTLED_METHODS:
+            return await super().make_request(bot, method, timeout)
+
+        priority = _priority.get()
+        stats = self.stats[priority]
+        chat_id = getattr(method, 'chat_id', None)
+        chat_bucket = self._chat_bucket(chat_id) if isinstance(chat_id, (int, str)) else None
+
+        attempt = 0
+        while True:
+            started_at = time.monotonic()
+            stats.queued += 1
+            try:
+                if chat_bucket is not None:
+                    await chat_bucket.acquire()
+                await self.limiter.acquire(priority=priority)
+            finally:
+                stats.queued -= 1
+
+            waited = time.monotonic() - started_at
+            stats.requests += 1
+            stats.wait_seconds += waited
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+
+            try:
+                return await self._timed_request(bot, method, timeout)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                stats.retries += 1
+
+                logger.warning(
+                    '%s to chat %s hit flood control, retrying in %ss', method.__api_method__, chat_id, e.retry_after
+                )
+                # Only this chat waits, requests to other chats keep flowing
+                if chat_bucket is not None:
+                    chat_bucket.pause(e.retry_after)
+                else:
+                    await asyncio.sleep(e.retry_after)
@@ -0,0 +1,112 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError('TokenBucket: `rate` must be positive')
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        # Start from an empty bucket after the pause instead of bursting into another 429
+        self._tokens = 0.0
+        self._updated_at = self._paused_until
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        started_at = time.monotonic()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return time.monotonic() - started_at
+
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class PriorityTokenBucket(TokenBucket):
+    # Waiters are served by priority (lower first), then in arrival order
+    def __init__(self, rate: float, capacity: float | None = None):
+        super().__init__(rate=rate, capacity=capacity)
+        self._waiters: list[tuple[int, int, float, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._wakeup: asyncio.TimerHandle | None = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(not waiter[3].done() for waiter in self._waiters)
+
+    def _take(self, tokens: float) -> bool:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+
+        self._refill(now)
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def _dispatch(self) -> None:
+        self._wakeup = None
+
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._take(tokens):
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if not self._waiters or self._wakeup is not None:
+            return
+
+        now = time.monotonic()
+        if now < self._paused_until:
+            delay = self._paused_until - now
+        else:
+            self._refill(now)
+            delay = max(0.0, (self._waiters[0][2] - self._tokens) / self.rate)
+
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    async def acquire(self, tokens: float = 1.0, priority: int = 0) -> float:
+        started_at = time.monotonic()
+        if not self._waiters and self._take(tokens):
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), tokens, future))
+        # A more urgent waiter may need an earlier wakeup than the one already scheduled
+        if self._wakeup is not None and self._waiters[0][3] is future:
+            self._wakeup.cancel()
+            self._wakeup = None
+        self._schedule()
+
+        await future
+        return time.monotonic() - started_at
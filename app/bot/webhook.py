@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import signal
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from config.config import WebhookSettings
+
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    def __init__(self, *args: Any, max_concurrent_updates: int, **kwargs: Any):
+        super().__init__(*args, handle_in_background=True, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrent_updates)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+
+        # Holding the response until a slot is free pushes back on Telegram
+        # instead of piling up unbounded background tasks
+        await self._semaphore.acquire()
+        try:
+            feed_update_task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        self._background_feed_update_tasks.add(feed_update_task)
+        feed_update_task.add_done_callback(self._background_feed_update_tasks.discard)
+        feed_update_task.add_done_callback(lambda _: self._semaphore.release())
+
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def drain(self) -> None:
+        # Telegram got 200 for these already, it will not send them again.
+        # Open keep-alive connections may still hand in a few more, so loop until none are left.
+        while self._background_feed_update_tasks:
+            tasks = set(self._background_feed_update_tasks)
+            logger.info('Waiting for %s updates still being processed ...', len(tasks))
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_webhook(
+        dp: Dispatcher,
+        bot: Bot,
+        settings: WebhookSettings,
+        **kwargs: Any,
+) -> None:
+    async def on_startup(bot: Bot) -> None:
+        await bot.set_webhook(
+            url=f'{settings.base_url.rstrip("/")}{settings.path}',
+            secret_token=settings.secret,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(settings.max_concurrent_updates, 100),
+        )
+        logger.info('Webhook set to %s%s', settings.base_url.rstrip('/'), settings.path)
+
+    dp.startup.register(on_startup)
+
+    app = web.Application()
+    # aiohttp runs shutdown callbacks in order, so the dispatcher's shutdown handlers go first,
+    # while the request handler has not closed the bot session yet
+    setup_application(app, dp, bot=bot, **kwargs)
+    handler = LimitedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.secret,
+        max_concurrent_updates=settings.max_concurrent_updates,
+        **kwargs,
+    )
+    handler.register(app, path=settings.path)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    site = web.TCPSite(runner, host=settings.host, port=settings.port)
+    try:
+        await site.start()
+        logger.info('Webhook server is listening on %s:%s', settings.host, settings.port)
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass
+
+        await stop_event.wait()
+    finally:
+        # Stop taking new updates, finish the accepted ones, then shut down the app and the bot session
+        if site in runner.sites:
+            await site.stop()
+        await handler.drain()
+        await runner.cleanup()
+        logger.info('Webhook server stopped')
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import date, timedelta
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+from app.infrastructure.database import queries
+from app.infrastructure.database.db import (
+    add_users_activity,
+    create_activity_partitions,
+    get_activity_partitions,
+    roll_up_activity_partition,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityAggregator:
+    def __init__(
+            self,
+            db_pool: AsyncConnectionPool,
+            flush_interval: float = 5.0,
+            max_pending: int = 1000,
+            max_retained: int | None = None,
+    ):
+        if flush_interval <= 0:
+            raise ValueError('ActivityAggregator: `flush_interval` must be positive')
+        if max_pending <= 0:
+            raise ValueError('ActivityAggregator: `max_pending` must be positive')
+        if max_retained is not None and max_retained < max_pending:
+            raise ValueError('ActivityAggregator: `max_retained` must not be less than `max_pending`')
+
+        self.db_pool = db_pool
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # Rows kept for a retry while the database is unavailable
+        self.max_retained = max_retained if max_retained is not None else 10 * max_pending
+        self._pending: dict[tuple[int, date], int] = {}
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, user_id: int, actions: int = 1) -> None:
+        key = (user_id, date.today())
+        self._pending[key] = self._pending.get(key, 0) + actions
+
+        if len(self._pending) >= self.max_pending:
+            self._flush_requested.set()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+            activity = [(user_id, day, actions) for (user_id, day), actions in pending.items()]
+
+            try:
+                async with self.db_pool.connection() as connection:
+                    await add_users_activity(connection, activity=activity)
+            except Exception as e:
+                logger.exception('Failed to flush %s activity rows: %s', len(activity), e)
+                for key, actions in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + actions
+                self._drop_overflow()
+
+    def _drop_overflow(self) -> None:
+        # A long outage would otherwise keep every active (user, day) pair in memory, the oldest days go first
+        overflow = len(self._pending) - self.max_retained
+        if overflow <= 0:
+            return
+
+        dropped = sorted(self._pending, key=lambda key: key[1])[:overflow]
+        actions = sum(self._pending.pop(key) for key in dropped)
+        logger.warning(
+            'Dropped %s activity rows (%s actions) from %s to %s, the database is unavailable',
+            overflow, actions, dropped[0][1], dropped[-1][1],
+        )
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._closing = True
+        if self._task is not None:
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+        logger.info('Activity aggregator stopped')
+
+    async def _run(self) -> None:
+        while not self._closing:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            self._flush_requested.clear()
+            await self.flush()
+
+
+class ActivityPartitionMaintainer:
+    # `activity` is partitioned by day. Partitions for the next `ahead_days` days are created in advance,
+    # the ones older than `retention_days` are rolled up into `activity_monthly` and dropped.
+    def __init__(
+            self,
+            db_pool: AsyncConnectionPool | None,
+            retention_days: int = 90,
+            ahead_days: int = 7,
+            interval: float = 3600.0,
+    ):
+        if retention_days <= 0:
+            raise ValueError('ActivityPartitionMaintainer: `retention_days` must be positive')
+        if ahead_days <= 0:
+            raise ValueError('ActivityPartitionMaintainer: `ahead_days` must be positive')
+        if interval <= 0:
+            raise ValueError('ActivityPartitionMaintainer: `interval` must be positive')
+
+        self.db_pool = db_pool
+        self.retention_days = retention_days
+        self.ahead_days = ahead_days
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def maintain(self, connection: psycopg.AsyncConnection, first_day: date | None = None) -> None:
+        today = date.today()
+        cutoff = today - timedelta(days=self.retention_days)
+        first_day = max(first_day or today, cutoff)
+        last_day = today + timedelta(days=self.ahead_days)
+
+        async with connection.transaction():
+            await connection.execute(queries.ACTIVITY_MAINTENANCE_LOCK)
+            partitions = await get_activity_partitions(connection)
+
+            missing = [
+                first_day + timedelta(days=offset)
+                for offset in range((last_day - first_day).days + 1)
+                if first_day + timedelta(days=offset) not in partitions
+            ]
+            await create_activity_partitions(connection, days=missing)
+
+            for day in sorted(day for day in partitions if day < cutoff):
+                await roll_up_activity_partition(connection, partition=partitions[day])
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self.db_pool.connection() as connection:
+                    await self.maintain(connection)
+            except Exception as e:
+                logger.exception('Activity partition maintenance failed: %s', e)
+            await asyncio.sleep(self.interval)
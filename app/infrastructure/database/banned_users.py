@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from array import array
+from bisect import bisect_left
+from contextlib import suppress
+from itertools import chain, islice
+from typing import Iterable
+
+from psycopg_pool import AsyncConnectionPool
+from redis.asyncio import Redis
+from app.infrastructure.database.db import get_banned_user_ids
+from app.infrastructure.database.user_context import user_context_cache
+
+
+logger = logging.getLogger(__name__)
+
+BANNED_USERS_CHANNEL = 'banned_users'
+
+# Past this many ids a batch rebuilds the array once instead of shifting it for every id
+BULK_THRESHOLD = 32
+
+PUBLISH_CHUNK_SIZE = 10_000
+
+
+class BannedUsersIndex:
+    def __init__(self, user_ids: Iterable[int] = ()):
+        self._ids = array('q', sorted(set(user_ids)))
+
+    def __contains__(self, user_id: int) -> bool:
+        i = bisect_left(self._ids, user_id)
+        return i < len(self._ids) and self._ids[i] == user_id
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self._ids.buffer_info()[1] * self._ids.itemsize
+
+    def replace(self, user_ids: Iterable[int]) -> None:
+        self._ids = array('q', sorted(set(user_ids)))
+
+    def add(self, user_id: int) -> None:
+        i = bisect_left(self._ids, user_id)
+        if i == len(self._ids) or self._ids[i] != user_id:
+            self._ids.insert(i, user_id)
+
+    def discard(self, user_id: int) -> None:
+        i = bisect_left(self._ids, user_id)
+        if i < len(self._ids) and self._ids[i] == user_id:
+            del self._ids[i]
+
+    def add_many(self, user_ids: Iterable[int]) -> None:
+        new_ids = sorted({user_id for user_id in user_ids if user_id not in self})
+        if len(new_ids) <= BULK_THRESHOLD:
+            for user_id in new_ids:
+                self.add(user_id)
+            return
+
+        # Two sorted runs, which sorted() merges in linear time
+        self._ids = array('q', sorted(chain(self._ids, new_ids)))
+
+    def discard_many(self, user_ids: Iterable[int]) -> None:
+        user_ids = set(user_ids)
+        if len(user_ids) <= BULK_THRESHOLD:
+            for user_id in user_ids:
+                self.discard(user_id)
+            return
+
+        self._ids = array('q', (user_id for user_id in self._ids if user_id not in user_ids))
+
+
+class BannedUsersRegistry:
+    def __init__(
+            self,
+            db_pool: AsyncConnectionPool,
+            redis: Redis,
+            channel: str = BANNED_USERS_CHANNEL,
+            reconnect_delay: float = 5.0,
+    ):
+        self.db_pool = db_pool
+        self.redis = redis
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.index = BannedUsersIndex()
+        self._task: asyncio.Task | None = None
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.index
+
+    async def load(self) -> None:
+        async with self.db_pool.connection() as connection:
+            user_ids = await get_banned_user_ids(connection)
+
+        self.index.replace(user_ids)
+        logger.info('Loaded %s banned users (%s bytes)', len(self.index), self.index.nbytes)
+
+    def apply(self, user_ids: Iterable[int], banned: bool) -> None:
+        user_ids = list(user_ids)
+        if banned:
+            self.index.add_many(user_ids)
+        else:
+            self.index.discard_many(user_ids)
+
+        for user_id in user_ids:
+            user_context_cache.invalidate(user_id)
+
+    async def update(self, user_ids: Iterable[int], banned: bool) -> None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+
+        self.apply(user_ids, banned)
+
+        action = 'ban' if banned else 'unban'
+        ids = iter(user_ids)
+        try:
+            while chunk := list(islice(ids, PUBLISH_CHUNK_SIZE)):
+                await self.redis.publish(self.channel, f'{action}:{",".join(map(str, chunk))}')
+        except Exception as e:
+            logger.warning('Failed to publish banned users update: %s', e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def _handle_message(self, data: bytes | str) -> None:
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        action, _, raw_ids = data.partition(':')
+        if action not in ('ban', 'unban'):
+            logger.warning('Unknown banned users message: %s', data)
+            return
+
+        self.apply((int(user_id) for user_id in raw_ids.split(',') if user_id), banned=action == 'ban')
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Updates published while we were not subscribed are lost, so resync
+                    await self.load()
+
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self._handle_message(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('Banned users subscription failed: %s, retrying in %ss', e, self.reconnect_delay)
+                await asyncio.sleep(self.reconnect_delay)
@@ -19,8 +19,9 @@ def build_pg_conninfo(
         f"@{host}:{port}/{db_name}"
     )
 
-    logger.info(f"Building PostgreSQL connection string (password omitted): "
-                f"postgresql://{quote(user, safe='')}@{host}:{port}/{db_name}"
+    logger.info(
+        'Building PostgreSQL connection string (password omitted): postgresql://%s@%s:%s/%s',
+        quote(user, safe=''), host, port, db_name,
     )
 
     return conninfo
@@ -30,9 +31,9 @@ async def log_db_version(connection: AsyncConnection) -> None:
         async with connection.cursor() as cursor:
             await cursor.execute('SELECT version();')
             db_version = await cursor.fetchone()
-            logger.info(f'Connection to PostgreSQL version: {db_version[0]}')
+            logger.info('Connection to PostgreSQL version: %s', db_version[0])
     except Exception as e:
-        logger.warning(f'Failed to fetch DB version: {e}')
+        logger.warning('Failed to fetch DB version: %s', e)
 
 
 async def get_pg_connection(
@@ -50,7 +51,7 @@ async def get_pg_connection(
         await log_db_version(connection)
         return connection
     except Exception as e:
-        logger.exception(f'Failed to connect to PosrgreSQL: {e}')
+        logger.exception('Failed to connect to PosrgreSQL: %s', e)
         if connection:
             await connection.close()
         raise
@@ -65,6 +66,9 @@ async def get_pg_pool(
         min_size: int = 1,
         max_size: int = 3,
         timeout: float | None = 10.0,
+        max_idle: float = 600.0,
+        max_lifetime: float = 3600.0,
+        prepare_threshold: int | None = 5,
 ) -> AsyncConnectionPool:
     conninfo = build_pg_conninfo(db_name, host, port, user, password)
     db_pool: AsyncConnectionPool | None = None
@@ -75,6 +79,9 @@ async def get_pg_pool(
             min_size=min_size,
             max_size=max_size,
             timeout=timeout,
+            max_idle=max_idle,
+            max_lifetime=max_lifetime,
+            kwargs={'prepare_threshold': prepare_threshold},
             open=False,
         )
 
@@ -85,8 +92,8 @@ async def get_pg_pool(
 
         return db_pool
     except Exception as e:
-        logger.exception(f'Failed initialize PosrgreSQL pool: {e}')
+        logger.exception('Failed initialize PosrgreSQL pool: %s', e)
         if db_pool and not db_pool.closed:
-            db_pool.close()
+            await db_pool.close()
 
         raise
\ No newline at end of file
@@ -1,13 +1,30 @@
 import logging
 import psycopg
-from datetime import datetime, timezone
-from typing import Any
+from datetime import date, datetime, timedelta
+from functools import partial
+from psycopg import sql
+from typing import Any, AsyncIterator, Iterable
 from app.bot.enums.roles import UserRole
+from app.infrastructure.database import queries
+from app.infrastructure.database.lazy_connection import LazyConnection
+from app.infrastructure.database.user_context import user_context_invalidator
+from app.infrastructure.metrics import timed_query
 
 
 logger = logging.getLogger(__name__)
 
 
+async def _invalidate_after_commit(conn: psycopg.AsyncConnection | LazyConnection, user_ids: list[int]) -> None:
+    # Before the commit another update could still read the old row and cache it again
+    if not user_ids:
+        return
+    if isinstance(conn, LazyConnection):
+        conn.call_after_commit(partial(user_context_invalidator.invalidate, user_ids))
+    else:
+        await user_context_invalidator.invalidate(user_ids)
+
+
+@timed_query
 async def add_user(
         conn: psycopg.AsyncConnection,
         *,
@@ -19,17 +36,14 @@ async def add_user(
         banned: bool = False,
 ) -> None:
     async with conn.cursor() as cursor:
+        if username is not None:
+            await cursor.execute(
+                query=queries.RELEASE_USERNAME,
+                params={'user_id': user_id, 'username': username},
+                prepare=True,
+            )
         await cursor.execute(
-            query='''
-                INSERT INTO users(user_id, username, language, role, is_alive, banned)
-                    VALUES (
-                        %(user_id)s,
-                        %(username)s,
-                        %(language)s,
-                        %(role)s,
-                        %(is_alive)s,
-                        %(banned)s
-                    ) ON CONFLICT DO NOTHING;''',
+            query=queries.ADD_USER,
             params={
                 'user_id': user_id,
                 'username': username,
@@ -38,10 +52,13 @@ async def add_user(
                 'is_alive': is_alive,
                 'banned': banned,
             },
+            prepare=True,
         )
-    logger.info(f'User {user_id} added to table "users" at {datetime.now(timezone.utc)}, role: {role}')
+    await _invalidate_after_commit(conn, [user_id])
+    logger.info('User %s added to table "users", role: %s', user_id, role)
 
 
+@timed_query
 async def get_user(
         conn: psycopg.AsyncConnection,
         *,
@@ -49,18 +66,20 @@ async def get_user(
 ) -> tuple[Any, ...] | None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='SELECT * FROM users WHERE user_id = %s',
+            query=queries.GET_USER,
             params=(user_id,),
+            prepare=True,
         )
         try:
             row = await cursor.fetchone()
         except psycopg.InterfaceError:
             row = None
 
-    logger.info(f'Row is {row}')
+    logger.debug('Row is %s', row)
     return row if row else None
 
 
+@timed_query
 async def change_user_alive_status(
         conn: psycopg.AsyncConnection,
         *,
@@ -69,13 +88,63 @@ async def change_user_alive_status(
 ) -> None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='UPDATE users SET is_alive = %s WHERE user_id = %s',
+            query=queries.CHANGE_USER_ALIVE_STATUS,
             params=(is_alive, user_id),
+            prepare=True,
         )
+    await _invalidate_after_commit(conn, [user_id])
+
+    logger.info('Change user %s is_alive status to %s', user_id, is_alive)
 
-    logger.info(f'Change user {user_id} is_alive status to {is_alive}')
 
+@timed_query
+async def change_users_alive_status(
+        conn: psycopg.AsyncConnection,
+        *,
+        user_ids: list[int],
+        is_alive: bool,
+) -> None:
+    if not user_ids:
+        return
+
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            query=queries.CHANGE_USERS_ALIVE_STATUS,
+            params=(is_alive, user_ids),
+            prepare=True,
+        )
+    await _invalidate_after_commit(conn, user_ids)
 
+    logger.info('Change is_alive status to %s for %s users', is_alive, len(user_ids))
+
+
+async def iter_alive_user_ids(
+        conn: psycopg.AsyncConnection,
+        *,
+        after_user_id: int,
+        chunk_size: int = 10_000,
+) -> AsyncIterator[int]:
+    # A chunk is read in a transaction of its own and handed out only after it has ended,
+    # so no snapshot stays open while the caller works through the ids
+    while True:
+        async with conn.transaction():
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    query=queries.GET_ALIVE_USER_IDS,
+                    params=(after_user_id, chunk_size),
+                    prepare=True,
+                )
+                user_ids = [user_id for (user_id,) in await cursor.fetchall()]
+
+        for user_id in user_ids:
+            yield user_id
+
+        if len(user_ids) < chunk_size:
+            return
+        after_user_id = user_ids[-1]
+
+
+@timed_query
 async def change_user_banned_status_by_id(
         conn: psycopg.AsyncConnection,
         *,
@@ -84,28 +153,82 @@ async def change_user_banned_status_by_id(
 ) -> None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='UPDATE users SET banned = %s WHERE user_id = %s',
+            query=queries.CHANGE_USER_BANNED_STATUS_BY_ID,
             params=(banned, user_id),
+            prepare=True,
+        )
+    await _invalidate_after_commit(conn, [user_id])
+
+    logger.info('Update banned status to %s for user %s', banned, user_id)
+
+
+@timed_query
+async def set_users_banned_status_by_ids(
+        conn: psycopg.AsyncConnection,
+        *,
+        user_ids: list[int],
+        banned: bool,
+) -> list[tuple[int, bool]]:
+    # Ids and statuses before the change of the users that exist
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            query=queries.SET_USERS_BANNED_STATUS_BY_IDS,
+            params={'user_ids': user_ids, 'banned': banned},
+            prepare=True,
         )
+        rows = await cursor.fetchall()
 
-    logger.info(f'Update banned status to {banned} for user {user_id}')
+    await _invalidate_after_commit(conn, [user_id for user_id, was_banned in rows if was_banned != banned])
 
+    return rows
 
-async def change_user_banned_status_by_username(
+
+@timed_query
+async def set_users_banned_status_by_usernames(
         conn: psycopg.AsyncConnection,
         *,
-        username: str,
+        usernames: list[str],
         banned: bool,
+) -> list[tuple[int, bool, str]]:
+    # Same as above plus the lowercased username each row was found by
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            query=queries.SET_USERS_BANNED_STATUS_BY_USERNAMES,
+            params={'usernames': [username.lower() for username in usernames], 'banned': banned},
+            prepare=True,
+        )
+        rows = await cursor.fetchall()
+
+    await _invalidate_after_commit(conn, [user_id for user_id, was_banned, _ in rows if was_banned != banned])
+
+    return rows
+
+
+@timed_query
+async def update_username(
+        conn: psycopg.AsyncConnection,
+        *,
+        user_id: int,
+        username: str | None,
 ) -> None:
     async with conn.cursor() as cursor:
+        if username is not None:
+            await cursor.execute(
+                query=queries.RELEASE_USERNAME,
+                params={'user_id': user_id, 'username': username},
+                prepare=True,
+            )
         await cursor.execute(
-            query='UPDATE users SET banned = %s WHERE username = %s',
-            params=(banned, username),
+            query=queries.UPDATE_USERNAME,
+            params={'user_id': user_id, 'username': username},
+            prepare=True,
         )
+    await _invalidate_after_commit(conn, [user_id])
 
-    logger.info(f'Update banned status to {banned} for user {username}')
+    logger.info('Username of user %s changed to %s', user_id, username)
 
 
+@timed_query
 async def update_user_lang(
         conn: psycopg.AsyncConnection,
         *,
@@ -114,13 +237,16 @@ async def update_user_lang(
 ) -> None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='UPDATE users SET language = %s WHERE user_id = %s',
+            query=queries.UPDATE_USER_LANG,
             params=(lang, user_id),
+            prepare=True,
         )
+    await _invalidate_after_commit(conn, [user_id])
 
-    logger.info(f'Set language {lang} for user {user_id}')
+    logger.info('Set language %s for user %s', lang, user_id)
 
 
+@timed_query
 async def get_user_lang(
         conn: psycopg.AsyncConnection,
         *,
@@ -128,8 +254,9 @@ async def get_user_lang(
 ) -> str | None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='SELECT language FROM users WHERE user_id = %s',
+            query=queries.GET_USER_LANG,
             params=(user_id,),
+            prepare=True,
         )
 
         try:
@@ -137,11 +264,12 @@ async def get_user_lang(
         except psycopg.InterfaceError:
             row = None
         if not row:
-            logger.warning(f'No user with {user_id} found in the database')
+            logger.warning('No user with %s found in the database', user_id)
 
     return row[0] if row else None
 
 
+@timed_query
 async def get_user_alive_status(
         conn: psycopg.AsyncConnection,
         *,
@@ -149,8 +277,9 @@ async def get_user_alive_status(
 ) -> bool | None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='SELECT is_alive FROM users WHERE user_id = %s',
+            query=queries.GET_USER_ALIVE_STATUS,
             params=(user_id,),
+            prepare=True,
         )
 
         try:
@@ -158,11 +287,12 @@ async def get_user_alive_status(
         except psycopg.InterfaceError:
             row = None
         if not row:
-            logger.warning(f'No user with id:{user_id} found in the database')
+            logger.warning('No user with id:%s found in the database', user_id)
 
     return row[0] if row else None
 
 
+@timed_query
 async def get_user_banned_status_by_id(
         conn: psycopg.AsyncConnection,
         *,
@@ -170,8 +300,9 @@ async def get_user_banned_status_by_id(
 ) -> bool | None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='SELECT banned FROM users WHERE user_id = %s',
+            query=queries.GET_USER_BANNED_STATUS_BY_ID,
             params=(user_id,),
+            prepare=True,
         )
 
         try:
@@ -179,32 +310,24 @@ async def get_user_banned_status_by_id(
         except psycopg.InterfaceError:
             row = None
         if not row:
-            logger.warning(f'No user with id:{user_id} found in the database')
+            logger.warning('No user with id:%s found in the database', user_id)
 
     return row[0] if row else None
 
 
-async def get_user_banned_status_by_username(
-        conn: psycopg.AsyncConnection,
-        *,
-        username: str,
-) -> bool | None:
+@timed_query
+async def get_banned_user_ids(conn: psycopg.AsyncConnection) -> list[int]:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='SELECT banned FROM users WHERE username = %s',
-            params=(username,),
+            query=queries.GET_BANNED_USER_IDS,
+            prepare=True,
         )
+        rows = await cursor.fetchall()
 
-        try:
-            row = await cursor.fetchone()
-        except psycopg.InterfaceError:
-            row = None
-        if not row:
-            logger.warning(f'No user with username:{username} found in the database')
-
-    return row[0] if row else None
+    return [row[0] for row in rows]
 
 
+@timed_query
 async def get_user_role(
         conn: psycopg.AsyncConnection,
         *,
@@ -212,8 +335,9 @@ async def get_user_role(
 ) -> UserRole | None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='SELECT role FROM users WHERE user_id = %s',
+            query=queries.GET_USER_ROLE,
             params=(user_id,),
+            prepare=True,
         )
 
         try:
@@ -221,11 +345,12 @@ async def get_user_role(
         except psycopg.InterfaceError:
             row = None
         if not row:
-            logger.warning(f'No user with id:{user_id} found in the database')
+            logger.warning('No user with id:%s found in the database', user_id)
 
     return UserRole(row[0]) if row else None
 
 
+@timed_query
 async def add_user_activity(
         conn: psycopg.AsyncConnection,
         *,
@@ -233,29 +358,46 @@ async def add_user_activity(
 ) -> None:
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='''
-                INSERT INTO activity (user_id)
-                VALUES (%s)
-                ON CONFLICT (user_id, activity_date)
-                DO UPDATE
-                SET actions = activity.actions + 1;
-                ''',
-            params=(user_id,),
+            query=queries.ADD_USER_ACTIVITY,
+            params={'user_id': user_id},
+            prepare=True,
         )
 
-    logger.info(f'User {user_id} activity updated')
+    logger.debug('User %s activity updated', user_id)
 
 
-async def get_statistics(conn: psycopg.AsyncConnection) -> list[Any, ...] | None:
+@timed_query
+async def add_users_activity(
+        conn: psycopg.AsyncConnection,
+        *,
+        activity: list[tuple[int, date, int]],
+) -> None:
+    if not activity:
+        return
+
+    user_ids, activity_dates, actions = (list(column) for column in zip(*activity))
+
     async with conn.cursor() as cursor:
         await cursor.execute(
-            query='''
-                SELECT user_id, SUM(actions) AS total_activity
-                FROM activity
-                GROUP BY user_id
-                ORDER BY 2 DESC
-                LIMIT 5;
-                '''
+            query=queries.ADD_USERS_ACTIVITY,
+            params=(user_ids, activity_dates, actions),
+            prepare=True,
+        )
+
+    logger.info('Activity flushed for %s user-days', len(activity))
+
+
+@timed_query
+async def get_statistics(
+        conn: psycopg.AsyncConnection,
+        *,
+        limit: int = 5,
+) -> list[Any, ...] | None:
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            query=queries.GET_STATISTICS,
+            params=(limit,),
+            prepare=True,
         )
 
         try:
@@ -264,3 +406,74 @@ async def get_statistics(conn: psycopg.AsyncConnection) -> list[Any, ...] | None
             rows = None
 
     return [*rows] if rows else None
+
+
+ACTIVITY_PARTITION_PREFIX = 'activity_p'
+
+
+def activity_partition_name(day: date) -> str:
+    return f'{ACTIVITY_PARTITION_PREFIX}{day:%Y%m%d}'
+
+
+@timed_query
+async def get_activity_partitions(
+        conn: psycopg.AsyncConnection,
+) -> dict[date, str]:
+    async with conn.cursor() as cursor:
+        await cursor.execute(query=queries.GET_ACTIVITY_PARTITIONS)
+        rows = await cursor.fetchall()
+
+    partitions = {}
+    for (name,) in rows:
+        if not name.startswith(ACTIVITY_PARTITION_PREFIX):
+            continue
+        try:
+            day = datetime.strptime(name.removeprefix(ACTIVITY_PARTITION_PREFIX), '%Y%m%d').date()
+        except ValueError:
+            continue
+        partitions[day] = name
+
+    return partitions
+
+
+@timed_query
+async def create_activity_partitions(
+        conn: psycopg.AsyncConnection,
+        *,
+        days: Iterable[date],
+) -> int:
+    created = 0
+    async with conn.cursor() as cursor:
+        for day in days:
+            await cursor.execute(
+                query=queries.CREATE_ACTIVITY_PARTITION.format(
+                    partition=sql.Identifier(activity_partition_name(day)),
+                    start=sql.Literal(day),
+                    end=sql.Literal(day + timedelta(days=1)),
+                ),
+            )
+            created += 1
+
+    if created:
+        logger.info('Created %s activity partitions', created)
+    return created
+
+
+@timed_query
+async def roll_up_activity_partition(
+        conn: psycopg.AsyncConnection,
+        *,
+        partition: str,
+) -> int:
+    # Call inside a transaction: the rollup and the drop must not be separated
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            query=queries.ROLL_UP_ACTIVITY_PARTITION.format(partition=sql.Identifier(partition)),
+        )
+        rolled_up = cursor.rowcount
+        await cursor.execute(
+            query=queries.DROP_ACTIVITY_PARTITION.format(partition=sql.Identifier(partition)),
+        )
+
+    logger.info('Activity partition %s rolled up into %s monthly rows and dropped', partition, rolled_up)
+    return rolled_up
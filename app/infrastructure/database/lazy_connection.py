@@ -0,0 +1,89 @@
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from psycopg import AsyncConnection, AsyncCursor
+from psycopg_pool import AsyncConnectionPool
+from app.infrastructure.metrics import POOL_CHECKOUT_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+
+class LazyConnection:
+    def __init__(self, db_pool: AsyncConnectionPool):
+        self.db_pool = db_pool
+        self._stack: AsyncExitStack | None = None
+        self._connection: AsyncConnection | None = None
+        self._pipelined = False
+        self._after_commit: list[Callable[[], Awaitable[None]]] = []
+
+    async def __aenter__(self) -> 'LazyConnection':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.release(exc)
+
+    @property
+    def acquired(self) -> bool:
+        return self._connection is not None
+
+    async def acquire(self, pipeline: bool = False) -> AsyncConnection:
+        if self._connection is not None:
+            return self._connection
+
+        stack = AsyncExitStack()
+        try:
+            started_at = time.perf_counter()
+            connection = await stack.enter_async_context(self.db_pool.connection())
+            POOL_CHECKOUT_SECONDS.observe((), time.perf_counter() - started_at)
+            if pipeline:
+                # Entered before the transaction, so BEGIN and COMMIT travel with the statements
+                await stack.enter_async_context(connection.pipeline())
+            await stack.enter_async_context(connection.transaction())
+        except BaseException:
+            await stack.aclose()
+            raise
+
+        self._stack, self._connection, self._pipelined = stack, connection, pipeline
+        return connection
+
+    def call_after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        # Dropped if the transaction rolls back
+        self._after_commit.append(callback)
+
+    async def release(self, exc: BaseException | None = None) -> None:
+        callbacks, self._after_commit = self._after_commit, []
+        if self._stack is None:
+            return
+
+        stack, self._stack, self._connection, self._pipelined = self._stack, None, None, False
+
+        if exc is not None:
+            await stack.__aexit__(type(exc), exc, exc.__traceback__)
+            return
+
+        await stack.aclose()
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.warning('After-commit callback failed: %s', e)
+
+    @asynccontextmanager
+    async def cursor(self, *args: Any, **kwargs: Any) -> AsyncIterator[AsyncCursor]:
+        connection = await self.acquire()
+        async with connection.cursor(*args, **kwargs) as cursor:
+            yield cursor
+
+    @asynccontextmanager
+    async def pipeline(self) -> AsyncIterator[None]:
+        if self._connection is None:
+            await self.acquire(pipeline=True)
+
+        if self._pipelined:
+            yield
+        else:
+            async with self._connection.pipeline():
+                yield
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from contextlib import suppress
+
+from psycopg_pool import AsyncConnectionPool
+
+
+logger = logging.getLogger(__name__)
+
+GAUGES = ('pool_min', 'pool_max', 'pool_size', 'pool_available', 'requests_waiting')
+
+
+class PoolStatsReporter:
+    def __init__(self, db_pool: AsyncConnectionPool, interval: float = 60.0):
+        if interval <= 0:
+            raise ValueError('PoolStatsReporter: `interval` must be positive')
+
+        self.db_pool = db_pool
+        self.interval = interval
+        self._previous: dict[str, int] = {}
+        self._task: asyncio.Task | None = None
+
+    def snapshot(self) -> dict[str, int]:
+        stats = self.db_pool.get_stats()
+        stats.setdefault('requests_waiting', 0)
+        stats['connections_in_use'] = stats.get('pool_size', 0) - stats.get('pool_available', 0)
+        return stats
+
+    def report(self) -> dict[str, int]:
+        stats = self.snapshot()
+        delta = {
+            name: value - self._previous.get(name, 0)
+            for name, value in stats.items()
+            if name not in GAUGES and name != 'connections_in_use'
+        }
+        self._previous = stats
+
+        requests_num = delta.get('requests_num', 0)
+        requests_queued = delta.get('requests_queued', 0)
+        avg_wait_ms = delta.get('requests_wait_ms', 0) / requests_queued if requests_queued else 0.0
+
+        logger.info(
+            'Pool stats: size=%s/%s, in_use=%s, waiting=%s, requests=%s, queued=%s, avg_wait_ms=%.1f, errors=%s',
+            stats.get('pool_size'),
+            stats.get('pool_max'),
+            stats['connections_in_use'],
+            stats['requests_waiting'],
+            requests_num,
+            requests_queued,
+            avg_wait_ms,
+            delta.get('requests_errors', 0),
+        )
+
+        if requests_queued and requests_num and requests_queued / requests_num > 0.1:
+            logger.warning(
+                '%s of %s pool requests had to wait for a connection, consider increasing POSTGRES_POOL_MAX_SIZE',
+                requests_queued,
+                requests_num,
+            )
+
+        return stats
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.report()
+            except Exception as e:
+                logger.warning('Failed to report pool stats: %s', e)
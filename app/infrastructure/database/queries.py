@@ -0,0 +1,149 @@
+from psycopg import sql
+
+
+ADD_USER = '''
+    INSERT INTO users(user_id, username, language, role, is_alive, banned)
+        VALUES (
+            %(user_id)s,
+            %(username)s,
+            %(language)s,
+            %(role)s,
+            %(is_alive)s,
+            %(banned)s
+        ) ON CONFLICT DO NOTHING;'''
+
+GET_USER = 'SELECT * FROM users WHERE user_id = %s'
+
+GET_USER_CONTEXT = 'SELECT language, role, is_alive, banned, username FROM users WHERE user_id = %s'
+
+GET_USER_LANG = 'SELECT language FROM users WHERE user_id = %s'
+
+GET_USER_ALIVE_STATUS = 'SELECT is_alive FROM users WHERE user_id = %s'
+
+GET_USER_BANNED_STATUS_BY_ID = 'SELECT banned FROM users WHERE user_id = %s'
+
+GET_BANNED_USER_IDS = 'SELECT user_id FROM users WHERE banned'
+
+GET_USER_ROLE = 'SELECT role FROM users WHERE user_id = %s'
+
+CHANGE_USER_ALIVE_STATUS = 'UPDATE users SET is_alive = %s WHERE user_id = %s'
+
+CHANGE_USERS_ALIVE_STATUS = 'UPDATE users SET is_alive = %s WHERE user_id = ANY(%s)'
+
+GET_ALIVE_USER_IDS = '''
+    SELECT user_id
+    FROM users
+    WHERE is_alive AND NOT banned AND user_id > %s
+    ORDER BY user_id
+    LIMIT %s;'''
+
+CHANGE_USER_BANNED_STATUS_BY_ID = 'UPDATE users SET banned = %s WHERE user_id = %s'
+
+# Both return the statuses before the change and only write the ones that actually change
+SET_USERS_BANNED_STATUS_BY_IDS = '''
+    WITH target AS (
+        SELECT user_id, banned
+        FROM users
+        WHERE user_id = ANY(%(user_ids)s::bigint[])
+        FOR UPDATE
+    ), updated AS (
+        UPDATE users u
+        SET banned = %(banned)s
+        FROM target t
+        WHERE u.user_id = t.user_id AND t.banned <> %(banned)s
+    )
+    SELECT user_id, banned FROM target;'''
+
+SET_USERS_BANNED_STATUS_BY_USERNAMES = '''
+    WITH target AS (
+        SELECT user_id, banned, lower(username) AS username
+        FROM users
+        WHERE lower(username) = ANY(%(usernames)s::text[]) AND username IS NOT NULL
+        FOR UPDATE
+    ), updated AS (
+        UPDATE users u
+        SET banned = %(banned)s
+        FROM target t
+        WHERE u.user_id = t.user_id AND t.banned <> %(banned)s
+    )
+    SELECT user_id, banned, username FROM target;'''
+
+# Usernames move between accounts, whoever had it before has changed theirs since
+RELEASE_USERNAME = '''
+    UPDATE users
+    SET username = NULL
+    WHERE lower(username) = lower(%(username)s) AND username IS NOT NULL AND user_id <> %(user_id)s;'''
+
+UPDATE_USERNAME = '''
+    UPDATE users
+    SET username = %(username)s
+    WHERE user_id = %(user_id)s AND username IS DISTINCT FROM %(username)s;'''
+
+UPDATE_USER_LANG = 'UPDATE users SET language = %s WHERE user_id = %s'
+
+ADD_USER_ACTIVITY = '''
+    WITH upserted AS (
+        INSERT INTO activity (user_id)
+        VALUES (%(user_id)s)
+        ON CONFLICT (user_id, activity_date)
+        DO UPDATE
+        SET actions = activity.actions + 1
+    )
+    INSERT INTO activity_totals (user_id, total_actions)
+    VALUES (%(user_id)s, 1)
+    ON CONFLICT (user_id)
+    DO UPDATE
+    SET total_actions = activity_totals.total_actions + 1;'''
+
+ADD_USERS_ACTIVITY = '''
+    WITH batch AS (
+        SELECT a.user_id, a.activity_date, a.actions
+        FROM unnest(%s::bigint[], %s::date[], %s::int[]) AS a(user_id, activity_date, actions)
+        JOIN users u ON u.user_id = a.user_id
+    ), upserted AS (
+        INSERT INTO activity (user_id, activity_date, actions)
+        SELECT user_id, activity_date, actions
+        FROM batch
+        ON CONFLICT (user_id, activity_date)
+        DO UPDATE
+        SET actions = activity.actions + EXCLUDED.actions
+    )
+    INSERT INTO activity_totals (user_id, total_actions)
+    SELECT user_id, SUM(actions)
+    FROM batch
+    GROUP BY user_id
+    ON CONFLICT (user_id)
+    DO UPDATE
+    SET total_actions = activity_totals.total_actions + EXCLUDED.total_actions;'''
+
+GET_STATISTICS = '''
+    SELECT user_id, total_actions
+    FROM activity_totals
+    ORDER BY total_actions DESC
+    LIMIT %s;'''
+
+# Any constant shared by all bot processes, so only one of them maintains partitions at a time
+ACTIVITY_MAINTENANCE_LOCK = 'SELECT pg_advisory_xact_lock(728431)'
+
+GET_ACTIVITY_PARTITIONS = '''
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'activity'::regclass;'''
+
+# DDL takes no bind parameters, partition names and bounds are composed with psycopg.sql
+CREATE_ACTIVITY_PARTITION = sql.SQL('''
+    CREATE TABLE IF NOT EXISTS {partition}
+    PARTITION OF activity
+    FOR VALUES FROM ({start}) TO ({end});''')
+
+ROLL_UP_ACTIVITY_PARTITION = sql.SQL('''
+    INSERT INTO activity_monthly (user_id, month, actions)
+    SELECT user_id, date_trunc('month', activity_date)::date, SUM(actions)
+    FROM {partition}
+    GROUP BY 1, 2
+    ON CONFLICT (user_id, month)
+    DO UPDATE
+    SET actions = activity_monthly.actions + EXCLUDED.actions;''')
+
+DROP_ACTIVITY_PARTITION = sql.SQL('DROP TABLE {partition}')
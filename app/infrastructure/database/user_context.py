@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass
+from itertools import islice
+from typing import Iterable
+
+import psycopg
+from redis.asyncio import Redis
+from app.bot.enums.roles import UserRole
+from app.infrastructure.database import queries
+from app.infrastructure.metrics import timed_query
+
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+USER_CONTEXT_CHANNEL = 'user_context'
+
+PUBLISH_CHUNK_SIZE = 10_000
+
+
+@dataclass(frozen=True, slots=True)
+class UserContext:
+    user_id: int
+    language: str
+    role: UserRole
+    is_alive: bool
+    banned: bool
+    username: str | None
+
+
+class UserContextCache:
+    def __init__(self, ttl: float = 60.0, max_size: int = 10_000):
+        if ttl <= 0:
+            raise ValueError('UserContextCache: `ttl` must be positive')
+        if max_size <= 0:
+            raise ValueError('UserContextCache: `max_size` must be positive')
+
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[int, tuple[float, UserContext | None]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> UserContext | None | object:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return MISSING
+
+        expires_at, user_context = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return MISSING
+
+        self._entries.move_to_end(user_id)
+        return user_context
+
+    def set(self, user_id: int, user_context: UserContext | None) -> None:
+        self._entries[user_id] = (time.monotonic() + self.ttl, user_context)
+        self._entries.move_to_end(user_id)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class UserContextInvalidator:
+    # Every replica keeps its own cache, so a changed user is dropped here and announced to the others
+    def __init__(
+            self,
+            cache: UserContextCache,
+            channel: str = USER_CONTEXT_CHANNEL,
+            reconnect_delay: float = 5.0,
+    ):
+        self.cache = cache
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.redis: Redis | None = None
+        self._task: asyncio.Task | None = None
+
+    async def invalidate(self, user_ids: Iterable[int]) -> None:
+        user_ids = list(user_ids)
+        for user_id in user_ids:
+            self.cache.invalidate(user_id)
+
+        if self.redis is None or not user_ids:
+            return
+
+        ids = iter(user_ids)
+        try:
+            while chunk := list(islice(ids, PUBLISH_CHUNK_SIZE)):
+                await self.redis.publish(self.channel, ','.join(map(str, chunk)))
+        except Exception as e:
+            logger.warning('Failed to publish user context invalidation: %s', e)
+
+    def start(self, redis: Redis) -> None:
+        self.redis = redis
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self.redis = None
+
+    def _handle_message(self, data: bytes | str) -> None:
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        for user_id in data.split(','):
+            if user_id:
+                self.cache.invalidate(int(user_id))
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Invalidations published while we were not subscribed are lost, so start over
+                    self.cache.clear()
+
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self._handle_message(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('User context subscription failed: %s, retrying in %ss', e, self.reconnect_delay)
+                await asyncio.sleep(self.reconnect_delay)
+
+
+user_context_cache = UserContextCache()
+user_context_invalidator = UserContextInvalidator(user_context_cache)
+
+
+@timed_query
+async def get_user_context(
+        conn: psycopg.AsyncConnection,
+        *,
+        user_id: int,
+        cache: UserContextCache = user_context_cache,
+) -> UserContext | None:
+    user_context = cache.get(user_id)
+    if user_context is not MISSING:
+        return user_context
+
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            query=queries.GET_USER_CONTEXT,
+            params=(user_id,),
+            prepare=True,
+        )
+
+        try:
+            row = await cursor.fetchone()
+        except psycopg.InterfaceError:
+            row = None
+
+    if row:
+        user_context = UserContext(
+            user_id=user_id,
+            language=row[0],
+            role=UserRole(row[1]),
+            is_alive=row[2],
+            banned=row[3],
+            username=row[4],
+        )
+    else:
+        user_context = None
+
+    cache.set(user_id, user_context)
+
+    return user_context
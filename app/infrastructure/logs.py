@@ -0,0 +1,86 @@
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import TextIO
+
+from config.config import LogSettings
+
+
+class DeferredQueueHandler(QueueHandler):
+    # The stock handler formats the record before enqueueing it, i.e. on the event loop.
+    # The queue never leaves the process, so the record goes as is and the listener thread formats it.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    # Lets through at most `burst` records per call site in every `interval` seconds,
+    # errors always pass. The next record that gets through reports how many were dropped.
+    def __init__(self, burst: int, interval: float, max_level: int = logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        # (pathname, lineno) -> [window start, records let through, records dropped]
+        self._sites: dict[tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+
+        key = (record.pathname, record.lineno)
+        site = self._sites.get(key)
+        if site is None or record.created - site[0] >= self.interval:
+            dropped = site[2] if site is not None else 0
+            self._sites[key] = [record.created, 1, 0]
+            if dropped:
+                record.msg = f'{record.msg} [{dropped} similar messages dropped]'
+            return True
+
+        if site[1] < self.burst:
+            site[1] += 1
+            return True
+
+        site[2] += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'location': f'{record.filename}:{record.lineno}',
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(settings: LogSettings, stream: TextIO | None = None) -> QueueListener:
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if settings.json else logging.Formatter(settings.frmt))
+
+    # The event loop only puts records on the queue, formatting and writing happen on the listener thread
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    if settings.rate_limit > 0:
+        handler.addFilter(RateLimitFilter(burst=settings.rate_limit, interval=settings.rate_limit_interval))
+
+    root = logging.getLogger()
+    root.setLevel(settings.level)
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+
+    listener = QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+
+    return listener
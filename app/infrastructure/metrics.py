@@ -0,0 +1,167 @@
+import functools
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Iterable, ParamSpec, TypeVar
+
+from aiohttp import web
+
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec('P')
+R = TypeVar('R')
+
+# Seconds, from a cache hit to a slow Telegram call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...] = (), amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in self._values.items():
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+
+
+class Histogram:
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label set: a count for every bucket plus +Inf, then the sum
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        values = self._values.get(labels)
+        if values is None:
+            values = self._values[labels] = [0] * (len(self.buckets) + 2)
+
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def collect(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, values in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), values):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {values[-1]}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = True
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors: list[Callable[[], dict[str, float]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], dict[str, float]]) -> None:
+        # Gauges read on scrape, e.g. pool stats; keys are complete sample names with labels
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+
+        for collector in self._collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                logger.warning('Metrics collector %s failed: %s', collector, e)
+                continue
+            lines.extend(f'{name} {value}' for name, value in samples.items())
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+UPDATES = registry.counter('bot_updates_total', 'Updates received, by type', ('type',))
+UPDATE_SECONDS = registry.histogram('bot_update_seconds', 'Time to process an update, by type', ('type',))
+MIDDLEWARE_SECONDS = registry.histogram(
+    'bot_middleware_seconds', 'Time spent in a middleware itself, without what it wraps', ('middleware',)
+)
+HANDLER_SECONDS = registry.histogram('bot_handler_seconds', 'Time spent in a handler', ('handler',))
+HANDLER_ERRORS = registry.counter('bot_handler_errors_total', 'Handlers that raised', ('handler',))
+QUERY_SECONDS = registry.histogram('db_query_seconds', 'Time spent in a db.py function', ('query',))
+POOL_CHECKOUT_SECONDS = registry.histogram('db_pool_checkout_seconds', 'Time to get a connection from the pool')
+TELEGRAM_SECONDS = registry.histogram('telegram_request_seconds', 'Bot API call duration, by method', ('method',))
+
+
+def timed_query(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+    labels = (func.__name__,)
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        if not registry.enabled:
+            return await func(*args, **kwargs)
+
+        started_at = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            QUERY_SECONDS.observe(labels, time.perf_counter() - started_at)
+
+    return wrapper
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    async def metrics(_: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info('Metrics are served on http://%s:%s/metrics', host, port)
+
+    return runner
+
+
+def gauges(prefix: str, values: dict[str, Any], labels: str = '') -> dict[str, float]:
+    labels = f'{{{labels}}}' if labels else ''
+    return {
+        f'{prefix}_{name}{labels}': value
+        for name, value in values.items()
+        if isinstance(value, (int, float))
+    }
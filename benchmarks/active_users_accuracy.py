@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import random
+from datetime import date, timedelta
+
+from redis.asyncio import Redis
+
+from app.bot.services.active_users import ActiveUsersCounter, month_start
+from config.config import Config, load_config
+
+
+# Not the live prefix, so real statistics are left alone
+PREFIX = 'active_users_check'
+
+# Redis HyperLogLogs have a 0.81% standard error, 3 sigma is well past any honest miss
+MAX_ERROR = 3 * 0.0081
+
+
+def simulate(days: int, users: int, daily_share: float) -> dict[date, set[int]]:
+    # Everyone has a fixed activity level, so the same people come back day after day
+    today = date.today()
+    activity = [random.betavariate(0.5, 4) for _ in range(users)]
+    scale = daily_share / (sum(activity) / users)
+
+    return {
+        today - timedelta(days=offset): {
+            user_id for user_id, level in enumerate(activity, 10 ** 9) if random.random() < level * scale
+        }
+        for offset in range(days)
+    }
+
+
+async def cleanup(redis: Redis) -> None:
+    keys = [key async for key in redis.scan_iter(match=f'{PREFIX}:*')]
+    if keys:
+        await redis.unlink(*keys)
+
+
+async def fill(counter: ActiveUsersCounter, history: dict[date, set[int]]) -> None:
+    for day, user_ids in history.items():
+        for user_id in user_ids:
+            counter.add(user_id, day=day)
+        await counter.flush()
+
+
+async def measure(
+        counter: ActiveUsersCounter,
+        history: dict[date, set[int]],
+) -> dict[str, tuple[date, date, int, int, float]]:
+    # Range name -> first day, last day, exact count, HyperLogLog estimate, relative error
+    today = date.today()
+    first_day = min(history)
+    ranges = {
+        'DAU': (today, today),
+        'WAU': (today - timedelta(days=6), today),
+        'MAU': (today - timedelta(days=29), today),
+        'previous month': (month_start(month_start(today) - timedelta(days=1)), month_start(today) - timedelta(days=1)),
+        'whole history': (first_day, today),
+    }
+
+    results = {}
+    for name, (first, last) in ranges.items():
+        if first < first_day:
+            continue
+        exact = len(set().union(*(history[first + timedelta(days=offset)] for offset in range((last - first).days + 1))))
+        estimate = await counter.count(first, last)
+        results[name] = (first, last, exact, estimate, abs(estimate - exact) / exact if exact else 0.0)
+    return results
+
+
+def check_accuracy(results: dict[str, tuple[date, date, int, int, float]]) -> float:
+    worst = max((error for *_, error in results.values()), default=0.0)
+    assert worst < MAX_ERROR, f'HyperLogLog error {worst:.2%} is past the 3 sigma bound of {MAX_ERROR:.2%}'
+    return worst
+
+
+async def main(config: Config, days: int, users: int, daily_share: float) -> None:
+    redis = Redis(
+        host=config.redis.host,
+        port=config.redis.port,
+        db=config.redis.db,
+        password=config.redis.password,
+        username=config.redis.username,
+    )
+    await cleanup(redis)
+
+    counter = ActiveUsersCounter(redis, prefix=PREFIX)
+    history = simulate(days, users, daily_share)
+    try:
+        await fill(counter, history)
+        results = await measure(counter, history)
+    finally:
+        await cleanup(redis)
+        await redis.aclose()
+
+    print(f'{users} users over {days} days, about {daily_share:.0%} of them active a day')
+    for name, (first, last, exact, estimate, error) in results.items():
+        print(f'{name:<16} {first} .. {last}  exact={exact:<9} hll={estimate:<9} error={error:.2%}')
+
+    print(f'worst error {check_accuracy(results):.2%}: ok')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HyperLogLog active user counts against exact ones')
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--daily-share', type=float, default=0.05)
+    parser.add_argument('--env', default='.env')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main(load_config(args.env), args.days, args.users, args.daily_share))
@@ -0,0 +1,55 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+import app.bot  # noqa: F401 - initializes app.bot before the database modules that import it
+from app.infrastructure.database.banned_users import BannedUsersIndex
+
+
+SAMPLE_LIMIT = 1_000_000
+
+
+def measure_set(user_ids: list[int]) -> int:
+    tracemalloc.start()
+    ids = set(user_ids)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ids
+    return size
+
+
+def main(total_users: int, ratios: list[float], lookups: int) -> None:
+    print(f'{"banned share":>12} {"banned":>10} {"array(q)":>12} {"set table":>12} {"lookup":>10}')
+
+    for ratio in ratios:
+        banned = int(total_users * ratio)
+        user_ids = random.sample(range(10 ** 9, 10 ** 10), banned)
+
+        index = BannedUsersIndex(user_ids)
+
+        sample = user_ids[:SAMPLE_LIMIT]
+        set_bytes = measure_set(sample) * banned // max(len(sample), 1)
+
+        probes = [random.randrange(10 ** 9, 10 ** 10) for _ in range(lookups)]
+        started = time.perf_counter()
+        for user_id in probes:
+            user_id in index
+        lookup_ns = (time.perf_counter() - started) / lookups * 1e9
+
+        print(
+            f'{ratio:>12.2%} {banned:>10} {index.nbytes / 2 ** 20:>9.2f} MB '
+            f'{set_bytes / 2 ** 20:>9.2f} MB {lookup_ns:>7.0f} ns'
+        )
+
+        del index, user_ids
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Memory use of the banned users index')
+    parser.add_argument('--users', type=int, default=10_000_000)
+    parser.add_argument('--ratios', type=float, nargs='+', default=[0.001, 0.01, 0.05, 0.1])
+    parser.add_argument('--lookups', type=int, default=200_000)
+    args = parser.parse_args()
+
+    main(args.users, args.ratios, args.lookups)
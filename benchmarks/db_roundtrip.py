@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from psycopg import AsyncConnection
+
+from app.infrastructure.database import queries
+from app.infrastructure.database.connections import build_pg_conninfo
+from config.config import Config, load_config
+
+
+BENCH_USER_ID = -424242
+
+
+async def measure(
+        name: str,
+        iterations: int,
+        run: Callable[[], Awaitable[None]],
+) -> None:
+    for _ in range(min(iterations, 20)):
+        await run()
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await run()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(
+        f'{name:<48} mean={statistics.fmean(timings):7.3f} ms  '
+        f'p50={timings[len(timings) // 2]:7.3f} ms  '
+        f'p99={timings[int(len(timings) * 0.99) - 1]:7.3f} ms'
+    )
+
+
+async def main(config: Config, iterations: int) -> None:
+    conninfo = build_pg_conninfo(
+        config.db.name, config.db.host, config.db.port, config.db.user, config.db.password
+    )
+    conn = await AsyncConnection.connect(conninfo=conninfo, prepare_threshold=None)
+
+    async with conn.transaction(force_rollback=True):
+        await conn.execute(
+            queries.ADD_USER,
+            {
+                'user_id': BENCH_USER_ID,
+                'username': 'bench_user',
+                'language': 'en',
+                'role': 'user',
+                'is_alive': True,
+                'banned': False,
+            },
+        )
+
+        # Before: one text query per middleware, re-parsed and re-planned every time
+        async def text_queries() -> None:
+            for query in (
+                    queries.GET_USER_BANNED_STATUS_BY_ID,
+                    queries.GET_USER_ROLE,
+                    queries.GET_USER_LANG,
+            ):
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, (BENCH_USER_ID,), prepare=False)
+                    await cursor.fetchone()
+
+        # After: the single user context query, prepared once per connection
+        async def prepared_context() -> None:
+            async with conn.cursor() as cursor:
+                await cursor.execute(queries.GET_USER_CONTEXT, (BENCH_USER_ID,), prepare=True)
+                await cursor.fetchone()
+
+        async def ban_sequential() -> None:
+            async with conn.transaction():
+                async with conn.cursor() as cursor:
+                    await cursor.execute(queries.GET_USER_BANNED_STATUS_BY_ID, (BENCH_USER_ID,))
+                    await cursor.fetchone()
+                    await cursor.execute(queries.CHANGE_USER_BANNED_STATUS_BY_ID, (False, BENCH_USER_ID))
+
+        async def ban_pipeline() -> None:
+            async with conn.pipeline():
+                async with conn.transaction():
+                    async with conn.cursor() as cursor:
+                        await cursor.execute(
+                            queries.GET_USER_BANNED_STATUS_BY_ID, (BENCH_USER_ID,), prepare=True
+                        )
+                        await cursor.fetchone()
+                        await cursor.execute(
+                            queries.CHANGE_USER_BANNED_STATUS_BY_ID, (False, BENCH_USER_ID), prepare=True
+                        )
+
+        async def start_sequential() -> None:
+            async with conn.transaction():
+                await conn.execute(queries.CHANGE_USER_ALIVE_STATUS, (True, BENCH_USER_ID))
+
+        async def start_pipeline() -> None:
+            async with conn.pipeline():
+                async with conn.transaction():
+                    await conn.execute(queries.CHANGE_USER_ALIVE_STATUS, (True, BENCH_USER_ID), prepare=True)
+
+        await measure('per-update lookups: 3 text queries', iterations, text_queries)
+        await measure('per-update lookups: 1 prepared query', iterations, prepared_context)
+        await measure('ban: sequential text statements', iterations, ban_sequential)
+        await measure('ban: prepared statements in pipeline', iterations, ban_pipeline)
+        await measure('/start: BEGIN + UPDATE + COMMIT sequential', iterations, start_sequential)
+        await measure('/start: BEGIN + UPDATE + COMMIT in pipeline', iterations, start_pipeline)
+
+    await conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Round-trip latency of db.py statements')
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--env', default='.env')
+    args = parser.parse_args()
+
+    asyncio.run(main(load_config(args.env), args.iterations))
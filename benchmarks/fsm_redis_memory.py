@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import random
+
+from aiogram.fsm.storage.base import DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import Redis
+
+from app.bot.fsm.migration import migrate_legacy_keys
+from app.bot.fsm.serialization import CompactKeyBuilder, msgpack_dumps, msgpack_loads
+from app.bot.fsm.storage import PipelinedRedisStorage
+from config.config import Config, load_config
+
+
+BATCH_SIZE = 1000
+
+# Same lengths as `fsm` and `f`, without touching live records
+BEFORE_PREFIX = 'fsx'
+AFTER_PREFIX = 'g'
+
+
+class LegacyLayoutStorage(PipelinedRedisStorage):
+    # What RedisStorage(redis=redis) wrote: None leftovers are kept
+    def _queue_data(self, pipe, key, data):
+        pipe.set(self.key_builder.build(key, 'data'), self.json_dumps(data), ex=self.data_ttl)
+
+
+def build_population(users: int, lang_share: float, active_share: float) -> list[tuple[int, str | None, dict]]:
+    population = []
+    for user_id in random.sample(range(10 ** 9, 10 ** 10), users):
+        roll = random.random()
+        if roll < active_share:
+            # In the middle of /lang right now
+            population.append((user_id, 'LangSG:lang', {'lang_settings_msg_id': 123456, 'user_lang': 'ru'}))
+        elif roll < lang_share:
+            # Finished /lang some time ago, only leftovers remain
+            population.append((user_id, None, {'lang_settings_msg_id': None, 'user_lang': None}))
+    return population
+
+
+async def fill(storage: RedisStorage, population: list[tuple[int, str | None, dict]]) -> None:
+    for i in range(0, len(population), BATCH_SIZE):
+        await asyncio.gather(*(
+            storage.set_state_and_data(
+                key=StorageKey(bot_id=0, chat_id=user_id, user_id=user_id),
+                state=state,
+                data=data,
+            )
+            for user_id, state, data in population[i:i + BATCH_SIZE]
+        ))
+
+
+async def cleanup(redis: Redis, prefix: str) -> None:
+    keys = [key async for key in redis.scan_iter(match=f'{prefix}:*', count=BATCH_SIZE)]
+    for i in range(0, len(keys), BATCH_SIZE):
+        await redis.unlink(*keys[i:i + BATCH_SIZE])
+
+
+async def report(name: str, redis: Redis, prefixes: tuple[str, ...], used_memory: int, users: int) -> None:
+    keys = [key for prefix in prefixes async for key in redis.scan_iter(match=f'{prefix}:*', count=BATCH_SIZE)]
+    expiring = sum(ttl > 0 for ttl in await asyncio.gather(*(redis.ttl(key) for key in keys)))
+    memory = (await redis.info('memory'))['used_memory'] - used_memory
+
+    print(
+        f'{name:<36} keys={len(keys):<8} expiring={expiring:<8} '
+        f'memory per 100k users={memory * 100_000 / users / 1024 / 1024:8.2f} MB'
+    )
+
+
+async def measure(
+        name: str,
+        redis: Redis,
+        storage: PipelinedRedisStorage,
+        prefix: str,
+        population: list[tuple[int, str | None, dict]],
+        users: int,
+) -> None:
+    await cleanup(redis, prefix)
+    before = (await redis.info('memory'))['used_memory']
+    await fill(storage, population)
+    await report(name, redis, (prefix,), before, users)
+    await cleanup(redis, prefix)
+
+
+async def measure_migration(
+        redis: Redis,
+        legacy: PipelinedRedisStorage,
+        storage: PipelinedRedisStorage,
+        population: list[tuple[int, str | None, dict]],
+        users: int,
+) -> None:
+    # Old records as a live instance has them, then what migrations/fsm_keys.py leaves behind
+    await cleanup(redis, BEFORE_PREFIX)
+    await cleanup(redis, AFTER_PREFIX)
+    before = (await redis.info('memory'))['used_memory']
+    await fill(legacy, population)
+
+    result = await migrate_legacy_keys(redis, storage, legacy_prefix=BEFORE_PREFIX, batch_size=BATCH_SIZE)
+    print(
+        f'migrated {result.states} states and {result.data} data records, '
+        f'removed {result.removed} legacy keys, skipped {result.skipped}'
+    )
+    await report('migrated: fsm:... -> f:...', redis, (BEFORE_PREFIX, AFTER_PREFIX), before, users)
+
+    await cleanup(redis, BEFORE_PREFIX)
+    await cleanup(redis, AFTER_PREFIX)
+
+
+async def main(config: Config, users: int, lang_share: float, active_share: float) -> None:
+    redis = Redis(
+        host=config.redis.host,
+        port=config.redis.port,
+        db=config.redis.db,
+        password=config.redis.password,
+        username=config.redis.username,
+    )
+    population = build_population(users, lang_share, active_share)
+    print(f'{users} users, {len(population)} with FSM records, {active_share:.1%} in the middle of /lang')
+
+    before = LegacyLayoutStorage(
+        redis=redis,
+        key_builder=DefaultKeyBuilder(prefix=BEFORE_PREFIX),
+        json_dumps=json.dumps,
+        json_loads=json.loads,
+    )
+
+    after = PipelinedRedisStorage(
+        redis=redis,
+        key_builder=CompactKeyBuilder(prefix=AFTER_PREFIX),
+        state_ttl=config.redis.fsm_state_ttl,
+        data_ttl=config.redis.fsm_data_ttl,
+        json_dumps=msgpack_dumps,
+        json_loads=msgpack_loads,
+    )
+
+    await measure('before: json, fsm:..., no TTL', redis, before, BEFORE_PREFIX, population, users)
+    await measure('after: msgpack, f:..., TTL, no None', redis, after, AFTER_PREFIX, population, users)
+    await measure_migration(redis, before, after, population, users)
+
+    await redis.aclose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Redis memory taken by FSM records')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--lang-share', type=float, default=0.3)
+    parser.add_argument('--active-share', type=float, default=0.01)
+    parser.add_argument('--env', default='.env')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main(load_config(args.env), args.users, args.lang_share, args.active_share))
@@ -0,0 +1,107 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Any
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from app.bot.middlewares.fsm_snapshot import FSMSnapshotMiddleware
+from app.bot.middlewares.i18n import TranslatorMiddleware
+from app.bot.middlewares.lang_settings import LangSettingsMiddleware
+from app.bot.states.states import LangSG
+
+
+class CountingStorage(MemoryStorage):
+    # Every call stands for one Redis round trip of PipelinedRedisStorage
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        self.calls['get_state'] += 1
+        return await super().get_state(key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self.calls['set_state'] += 1
+        await super().set_state(key, state)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        self.calls['get_data'] += 1
+        return await super().get_data(key)
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        self.calls['set_data'] += 1
+        await super().set_data(key, data)
+
+    async def set_state_and_data(self, key: StorageKey, state: StateType, data: dict[str, Any]) -> None:
+        self.calls['set_state_and_data'] += 1
+        await MemoryStorage.set_state(self, key, state)
+        await MemoryStorage.set_data(self, key, data)
+
+
+def build_save_click(user_id: int) -> Update:
+    user = User(id=user_id, is_bot=False, first_name='user', language_code='en')
+    return Update(
+        update_id=1,
+        callback_query=CallbackQuery(
+            id='1',
+            from_user=user,
+            chat_instance='1',
+            data='save_lang_button_data',
+            message=Message(
+                message_id=1,
+                date=datetime.now(),
+                chat=Chat(id=user_id, type='private'),
+                text='settings',
+            ),
+        ),
+    )
+
+
+async def run(name: str, snapshot: bool) -> None:
+    router = Router()
+
+    # Same FSM access pattern as process_save_click, without the Telegram and DB calls
+    @router.callback_query(F.data == 'save_lang_button_data')
+    async def handler(callback: CallbackQuery, state: FSMContext) -> None:
+        await state.get_data()
+        await state.update_data(lang_settings_msg_id=None, user_lang=None)
+        await state.set_state()
+
+    storage = CountingStorage()
+    dp = Dispatcher(storage=storage)
+    dp.include_router(router)
+    if snapshot:
+        dp.update.middleware(FSMSnapshotMiddleware())
+    dp.update.middleware(LangSettingsMiddleware())
+    dp.update.middleware(TranslatorMiddleware())
+
+    bot = Bot('42:BENCHMARK')
+    key = dp.fsm.get_context(bot, 1, 1).key
+    await storage.set_state(key, LangSG.lang)
+    await storage.set_data(key, {'lang_settings_msg_id': 1, 'user_lang': 'ru'})
+    storage.calls.clear()
+
+    await dp.feed_update(
+        bot,
+        build_save_click(1),
+        translations={'default': 'en', 'en': {}},
+        locales=frozenset({'en', 'ru'}),
+    )
+
+    calls = ', '.join(f'{call}={count}' for call, count in sorted(storage.calls.items()))
+    print(f'{name:<24} round trips per update={sum(storage.calls.values()):<3} {calls}')
+    await bot.session.close()
+
+
+async def main() -> None:
+    await run('plain FSMContext', snapshot=False)
+    await run('FSM snapshot', snapshot=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from app.infrastructure.logs import setup_logging
+from config.config import LogSettings
+
+
+FORMAT = '[%(asctime)s] #%(levelname)-8s %(filename)s:%(lineno)d - %(name)s - %(message)s'
+
+logger = logging.getLogger('app.infrastructure.database.db')
+event_logger = logging.getLogger('aiogram.event')
+
+
+class SlowStream:
+    # A terminal, pipe or log shipper that takes a while to accept every write
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        time.sleep(self.latency)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def handle_update_before(update_id: int, user_id: int) -> None:
+    # What an echo update logged before: eager f-strings at INFO
+    row = (user_id, 'user', 'en', 'user', True, False, datetime.now(timezone.utc))
+    logger.info(f'Row is {row}')
+    logger.info(f'User {user_id} activity updated')
+    event_logger.info(f'Update id={update_id} is handled. Duration 3 ms by bot id=42')
+
+
+def handle_update_after(update_id: int, user_id: int) -> None:
+    row = (user_id, 'user', 'en', 'user', True, False, datetime.now(timezone.utc))
+    logger.debug('Row is %s', row)
+    logger.debug('User %s activity updated', user_id)
+    event_logger.info('Update id=%s is handled. Duration %d ms by bot id=%d', update_id, 3, 42)
+
+
+async def watch_loop(lags: list[float], interval: float, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(name: str, handle_update, updates: int, rate: float) -> None:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(lags, 0.001, stop))
+
+    blocked = 0.0
+    started = time.perf_counter()
+    for update_id in range(updates):
+        call_started = time.perf_counter()
+        handle_update(update_id, update_id % 1000)
+        blocked += time.perf_counter() - call_started
+
+        # Updates arrive at `rate` per second, the loop is free in between
+        delay = started + (update_id + 1) / rate - time.perf_counter()
+        await asyncio.sleep(max(delay, 0))
+
+    stop.set()
+    await watcher
+    lags.sort()
+
+    print(
+        f'{name:<36} blocked {blocked * 1000:8.1f} ms in total, {blocked / updates * 1_000_000:7.1f} us per update  '
+        f'loop lag p99={lags[int(len(lags) * 0.99) - 1] * 1000:6.2f} ms max={lags[-1] * 1000:6.2f} ms'
+    )
+
+
+def configure_before(stream: SlowStream) -> None:
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+async def main(updates: int, rate: float, write_latency: float) -> None:
+    print(f'{updates} updates at {rate:.0f}/s, {write_latency * 1000:.2f} ms per write to the log output')
+
+    stream = SlowStream(write_latency)
+    configure_before(stream)
+    await run('before: sync handler, f-strings', handle_update_before, updates, rate)
+
+    for name, rate_limit in (('after: queue, lazy %', 0), ('after: queue, lazy %, rate limit', 20)):
+        stream = SlowStream(write_latency)
+        settings = LogSettings(level='INFO', frmt=FORMAT, json=False, rate_limit=rate_limit, rate_limit_interval=1.0)
+        listener = setup_logging(settings, stream=stream)
+        await run(name, handle_update_after, updates, rate)
+
+        drain_started = time.perf_counter()
+        listener.stop()
+        print(
+            f'{"":<36} {stream.writes} lines written, '
+            f'{(time.perf_counter() - drain_started) * 1000:.1f} ms to drain the queue at shutdown'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Event loop time spent on logging on the update path')
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=1000.0, help='updates per second')
+    parser.add_argument('--write-latency', type=float, default=0.05, help='ms per write to the log output')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.updates, args.rate, args.write_latency / 1000))
@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any
+
+from aiohttp import web
+
+
+BOT_USER = {'id': 42, 'is_bot': True, 'first_name': 'Load test bot', 'username': 'load_test_bot'}
+
+# Telegram chat ids of generated users, far away from real ones
+HOT_USERS_FROM = 7_000_000_000
+NEW_USERS_FROM = 7_100_000_000
+BANNED_USERS_FROM = 7_900_000_000
+
+# Replies that count as the bot's answer to an update
+RESPONSE_METHODS = frozenset({'sendMessage', 'copyMessage', 'copyMessages', 'editMessageText'})
+
+LANG_SWITCH_STEPS = ('/lang', 'ru', 'en', 'save_lang_button_data')
+
+
+class UpdateGenerator:
+    def __init__(
+            self,
+            hot_users: int,
+            hot_share: float,
+            new_share: float,
+            banned_share: float,
+            banned_users: int,
+            switcher_share: float,
+    ):
+        self.hot_users = hot_users
+        self.hot_weights = [1 / (rank + 1) for rank in range(hot_users)]
+        self.shares = (
+            ('hot', hot_share),
+            ('new', new_share),
+            ('banned', banned_share),
+            ('switcher', switcher_share),
+        )
+        self.banned_users = banned_users
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_user_ids = itertools.count(NEW_USERS_FROM)
+        self._switchers: dict[int, int] = {}
+
+    def _pick_kind(self) -> str:
+        roll = random.random() * sum(share for _, share in self.shares)
+        for kind, share in self.shares:
+            roll -= share
+            if roll < 0:
+                return kind
+        return self.shares[0][0]
+
+    def _hot_user(self) -> int:
+        return HOT_USERS_FROM + random.choices(range(self.hot_users), weights=self.hot_weights)[0]
+
+    def _message(self, user_id: int, text: str) -> dict[str, Any]:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'user', 'language_code': 'en'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        return message
+
+    def _callback(self, user_id: int, data: str) -> dict[str, Any]:
+        return {
+            'id': str(next(self._message_ids)),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'user', 'language_code': 'en'},
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'text': 'settings',
+            },
+        }
+
+    def next(self) -> tuple[str, dict[str, Any]]:
+        kind = self._pick_kind()
+        update_id = next(self._update_ids)
+
+        if kind == 'new':
+            return kind, {'update_id': update_id, 'message': self._message(next(self._new_user_ids), '/start')}
+        if kind == 'banned':
+            user_id = BANNED_USERS_FROM + random.randrange(self.banned_users)
+            return kind, {'update_id': update_id, 'message': self._message(user_id, 'hello')}
+        if kind == 'switcher':
+            user_id = self._hot_user()
+            step = self._switchers.get(user_id, 0)
+            self._switchers[user_id] = (step + 1) % len(LANG_SWITCH_STEPS)
+            text = LANG_SWITCH_STEPS[step]
+            if text.startswith('/'):
+                return kind, {'update_id': update_id, 'message': self._message(user_id, text)}
+            return kind, {'update_id': update_id, 'callback_query': self._callback(user_id, text)}
+
+        return kind, {'update_id': update_id, 'message': self._message(self._hot_user(), 'hello')}
+
+
+class MockBotAPI:
+    def __init__(self, generator: UpdateGenerator, rate: float, latency: float, error_rate: float, retry_after: int):
+        self.generator = generator
+        self.rate = rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.updates: deque[dict[str, Any]] = deque()
+        self.new_updates = asyncio.Event()
+        self.methods = Counter()
+        self.generated = Counter()
+        self.throttled = 0
+        self.latencies: list[float] = []
+        # Delivery times of updates per chat that are still waiting for a reply
+        self.pending: defaultdict[int, deque[float]] = defaultdict(deque)
+        self._chat_ids: dict[int, int] = {}
+
+    async def generate(self, duration: float) -> None:
+        started = time.monotonic()
+        produced = 0
+        while time.monotonic() - started < duration:
+            due = int((time.monotonic() - started) * self.rate)
+            for _ in range(due - produced):
+                kind, update = self.generator.next()
+                self.generated[kind] += 1
+                self.updates.append(update)
+            produced = due
+            self.new_updates.set()
+            await asyncio.sleep(0.01)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.methods[method] += 1
+        params = dict(await request.post())
+
+        if method == 'getUpdates':
+            return self._ok(await self._get_updates(params))
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method != 'getMe' and random.random() < self.error_rate:
+            self.throttled += 1
+            return web.json_response(
+                {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f'Too Many Requests: retry after {self.retry_after}',
+                    'parameters': {'retry_after': self.retry_after},
+                },
+                status=429,
+            )
+
+        if method in RESPONSE_METHODS:
+            self._record_response(int(params.get('chat_id', 0)))
+
+        if method == 'getMe':
+            return self._ok(BOT_USER)
+        if method == 'copyMessage':
+            return self._ok({'message_id': 1})
+        if method == 'copyMessages':
+            return self._ok([{'message_id': 1} for _ in json.loads(params.get('message_ids', '[]'))])
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            return self._ok({
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            })
+        # setMyCommands, deleteWebhook, answerCallbackQuery, editMessageReplyMarkup, ...
+        return self._ok(True)
+
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _get_updates(self, params: dict[str, str]) -> list[dict[str, Any]]:
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 100))
+        timeout = float(params.get('timeout', 0))
+
+        while self.updates and self.updates[0]['update_id'] < offset:
+            self._chat_ids.pop(self.updates.popleft()['update_id'], None)
+
+        if not self.updates and timeout:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return []
+
+        batch = list(itertools.islice(self.updates, limit))
+        now = time.monotonic()
+        for update in batch:
+            if update['update_id'] not in self._chat_ids:
+                chat_id = self._update_chat_id(update)
+                self._chat_ids[update['update_id']] = chat_id
+                self.pending[chat_id].append(now)
+        return batch
+
+    @staticmethod
+    def _update_chat_id(update: dict[str, Any]) -> int:
+        if 'message' in update:
+            return update['message']['chat']['id']
+        return update['callback_query']['message']['chat']['id']
+
+    def _record_response(self, chat_id: int) -> None:
+        pending = self.pending.get(chat_id)
+        if pending:
+            self.latencies.append(time.monotonic() - pending.popleft())
+
+    def report(self, final: bool = False) -> None:
+        latencies = sorted(self.latencies)
+        unanswered = sum(len(pending) for pending in self.pending.values())
+
+        line = f'generated={sum(self.generated.values())} answered={len(latencies)} unanswered={unanswered} '
+        if latencies:
+            line += (
+                f'p50={latencies[len(latencies) // 2] * 1000:.1f} ms '
+                f'p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms '
+                f'p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms '
+                f'mean={statistics.fmean(latencies) * 1000:.1f} ms '
+            )
+        line += f'throttled={self.throttled}'
+        print(line, flush=True)
+
+        if final:
+            print(f'updates by kind: {json.dumps(dict(self.generated))}')
+            print(f'requests by method: {json.dumps(dict(self.methods))}')
+
+
+async def main(args: argparse.Namespace) -> None:
+    api = MockBotAPI(
+        generator=UpdateGenerator(
+            hot_users=args.hot_users,
+            hot_share=args.hot_share,
+            new_share=args.new_share,
+            banned_share=args.banned_share,
+            banned_users=args.banned_users,
+            switcher_share=args.switcher_share,
+        ),
+        rate=args.rate,
+        latency=args.latency / 1000,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+    )
+
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=args.host, port=args.port).start()
+
+    print(
+        f'Mock Bot API on http://{args.host}:{args.port}, start the bot with BOT_API_BASE_URL pointing here. '
+        f'Banned users are {BANNED_USERS_FROM}..{BANNED_USERS_FROM + args.banned_users - 1}, '
+        f'mark them banned in the users table to exercise the shadow ban'
+    )
+    print(f'Waiting {args.warmup}s for the bot to connect ...', flush=True)
+    await asyncio.sleep(args.warmup)
+
+    generate = asyncio.create_task(api.generate(args.duration))
+    while not generate.done():
+        await asyncio.sleep(args.report_interval)
+        api.report()
+
+    # Let the bot drain what is left
+    await asyncio.sleep(args.drain)
+    api.report(final=True)
+    await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock Bot API server that load-tests a running bot')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rate', type=float, default=100.0, help='updates per second')
+    parser.add_argument('--duration', type=float, default=60.0)
+    parser.add_argument('--warmup', type=float, default=5.0)
+    parser.add_argument('--drain', type=float, default=10.0)
+    parser.add_argument('--report-interval', type=float, default=5.0)
+    parser.add_argument('--hot-users', type=int, default=1000)
+    parser.add_argument('--hot-share', type=float, default=0.8)
+    parser.add_argument('--new-share', type=float, default=0.1)
+    parser.add_argument('--banned-share', type=float, default=0.05)
+    parser.add_argument('--banned-users', type=int, default=100)
+    parser.add_argument('--switcher-share', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.0, help='ms added to every API call but getUpdates')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of API calls answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main(args))
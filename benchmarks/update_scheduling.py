@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseEventIsolation
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+
+from app.bot.fsm.isolation import KeyedEventIsolation
+
+
+def build_updates(count: int, users: int) -> list[Update]:
+    # A few hot users produce most of the traffic, like in production
+    weights = [1 / (rank + 1) for rank in range(users)]
+    user_ids = random.choices(range(1, users + 1), weights=weights, k=count)
+
+    return [
+        Update(
+            update_id=i,
+            message=Message(
+                message_id=i,
+                date=datetime.now(),
+                chat=Chat(id=user_id, type='private'),
+                from_user=User(id=user_id, is_bot=False, first_name='user'),
+                text=str(i),
+            ),
+        )
+        for i, user_id in enumerate(user_ids)
+    ]
+
+
+async def run(
+        name: str,
+        updates: list[Update],
+        isolation: BaseEventIsolation,
+        io_delay: float,
+        concurrent: bool,
+) -> None:
+    seen: dict[int, list[int]] = {}
+    router = Router()
+
+    @router.message()
+    async def handler(message: Message, state: FSMContext) -> None:
+        # Same read-modify-write shape as LangSettingsMiddleware and the settings handlers
+        data = await state.get_data()
+        await asyncio.sleep(io_delay)
+        await state.update_data(counter=data.get('counter', 0) + 1)
+        seen.setdefault(message.from_user.id, []).append(message.message_id)
+
+    dp = Dispatcher(storage=MemoryStorage(), events_isolation=isolation)
+    dp.include_router(router)
+    bot = Bot('42:BENCHMARK')
+
+    started = time.perf_counter()
+    if concurrent:
+        await asyncio.gather(*(dp.feed_update(bot, update) for update in updates))
+    else:
+        for update in updates:
+            await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - started
+
+    lost = 0
+    for user_id, message_ids in seen.items():
+        data = await dp.storage.get_data(dp.fsm.get_context(bot, user_id, user_id).key)
+        lost += len(message_ids) - data.get('counter', 0)
+    reordered = sum(message_ids != sorted(message_ids) for message_ids in seen.values())
+
+    print(
+        f'{name:<36} {len(updates) / elapsed:>10.0f} upd/s  '
+        f'lost FSM writes={lost:<6} users with reordered updates={reordered}'
+    )
+    await bot.session.close()
+
+
+async def main(count: int, users: int, io_delay: float, max_in_flight: int) -> None:
+    updates = build_updates(count, users)
+    print(f'{count} updates from {users} users, {io_delay * 1000:.0f} ms of I/O per update')
+
+    await run('serial (handle_as_tasks=False)', updates, DisabledEventIsolation(), io_delay, False)
+    await run('concurrent, no isolation', updates, DisabledEventIsolation(), io_delay, True)
+    await run(f'concurrent, keyed (max {max_in_flight})', updates, KeyedEventIsolation(max_in_flight), io_delay, True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Throughput of update scheduling modes')
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--io-delay', type=float, default=0.02)
+    parser.add_argument('--max-in-flight', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main(args.updates, args.users, args.io_delay, args.max_in_flight))
@@ -1,4 +1,5 @@
 import os
+import re
 import logging
 from dataclasses import dataclass
 from environs import Env
@@ -10,6 +11,14 @@ logger = logging.getLogger(__name__)
 class BotSettings:
     token: str
     admin_ids: list[int]
+    api_base_url: str
+    max_concurrent_updates: int
+    max_pending_updates: int
+    outbound_rate: float
+    outbound_chat_rate: float
+    outbound_chat_burst: float
+    outbound_group_rate: float
+    outbound_max_retries: int
 
 
 @dataclass
@@ -19,6 +28,16 @@ class DatabaseSettings:
     port: int
     user: str
     password: str
+    pool_min_size: int
+    pool_max_size: int
+    pool_max_idle: float
+    pool_max_lifetime: float
+    pool_timeout: float
+    pool_stats_interval: float
+    prepare_threshold: int | None
+    activity_retention_days: int
+    activity_partitions_ahead: int
+    activity_maintenance_interval: float
 
 
 @dataclass
@@ -28,12 +47,41 @@ class RedisSettings:
     db: int
     username: str
     password: str
+    fsm_cache_size: int
+    fsm_cache_bytes: int
+    fsm_cache_ttl: float
+    fsm_serializer: str
+    fsm_key_prefix: str
+    fsm_state_ttl: int | None
+    fsm_data_ttl: int | None
+    active_users_ttl_days: int
+
+
+@dataclass
+class WebhookSettings:
+    enabled: bool
+    base_url: str
+    path: str
+    secret: str | None
+    host: str
+    port: int
+    max_concurrent_updates: int
+
+
+@dataclass
+class MetricsSettings:
+    enabled: bool
+    host: str
+    port: int
 
 
 @dataclass
 class LogSettings:
     level: str
     frmt: str
+    json: bool
+    rate_limit: int
+    rate_limit_interval: float
 
 
 @dataclass
@@ -42,13 +90,15 @@ class Config:
     log: LogSettings
     db: DatabaseSettings
     redis: RedisSettings
+    webhook: WebhookSettings
+    metrics: MetricsSettings
 
 
 def load_config(path: str | None = None) -> Config:
     env = Env()
 
     if not os.path.exists(path):
-        logger.warning(f'.env file not find at {path}')
+        logger.warning('.env file not find at %s', path)
     else:
         logger.info('Loading .env')
 
@@ -66,32 +116,141 @@ def load_config(path: str | None = None) -> Config:
     except ValueError as e:
         raise ValueError('ADMIN_IDS must be integer!') from e
 
+    prepare_threshold = env.int('POSTGRES_PREPARE_THRESHOLD', default=5)
+
+    max_concurrent_updates = env.int('BOT_MAX_CONCURRENT_UPDATES', default=100)
+    max_pending_updates = env.int('BOT_MAX_PENDING_UPDATES', default=1000)
+
+    if not 0 < max_concurrent_updates <= max_pending_updates:
+        raise ValueError('BOT_MAX_CONCURRENT_UPDATES must be positive and not greater than BOT_MAX_PENDING_UPDATES!')
+
+    outbound_rate = env.float('BOT_OUTBOUND_RATE', default=30.0)
+    outbound_chat_rate = env.float('BOT_OUTBOUND_CHAT_RATE', default=1.0)
+    outbound_chat_burst = env.float('BOT_OUTBOUND_CHAT_BURST', default=3.0)
+    outbound_group_rate = env.float('BOT_OUTBOUND_GROUP_RATE', default=20 / 60)
+    outbound_max_retries = env.int('BOT_OUTBOUND_MAX_RETRIES', default=3)
+
+    if min(outbound_rate, outbound_chat_rate, outbound_chat_burst, outbound_group_rate) <= 0:
+        raise ValueError('BOT_OUTBOUND_RATE, BOT_OUTBOUND_CHAT_RATE, BOT_OUTBOUND_CHAT_BURST '
+                         'and BOT_OUTBOUND_GROUP_RATE must be positive!')
+
     db = DatabaseSettings(
         name=env('POSTGRES_DB'),
         host=env('POSTGRES_HOST'),
         port=int(env('POSTGRES_PORT')),
         user=env('POSTGRES_USER'),
-        password=env('POSTGRES_PASSWORD')
+        password=env('POSTGRES_PASSWORD'),
+        pool_min_size=env.int('POSTGRES_POOL_MIN_SIZE', default=1),
+        pool_max_size=env.int('POSTGRES_POOL_MAX_SIZE', default=3),
+        pool_max_idle=env.float('POSTGRES_POOL_MAX_IDLE', default=600.0),
+        pool_max_lifetime=env.float('POSTGRES_POOL_MAX_LIFETIME', default=3600.0),
+        pool_timeout=env.float('POSTGRES_POOL_TIMEOUT', default=10.0),
+        pool_stats_interval=env.float('POSTGRES_POOL_STATS_INTERVAL', default=60.0),
+        prepare_threshold=prepare_threshold if prepare_threshold >= 0 else None,
+        activity_retention_days=env.int('POSTGRES_ACTIVITY_RETENTION_DAYS', default=90),
+        activity_partitions_ahead=env.int('POSTGRES_ACTIVITY_PARTITIONS_AHEAD', default=7),
+        activity_maintenance_interval=env.float('POSTGRES_ACTIVITY_MAINTENANCE_INTERVAL', default=3600.0),
     )
 
+    if min(db.activity_retention_days, db.activity_partitions_ahead, db.activity_maintenance_interval) <= 0:
+        raise ValueError('POSTGRES_ACTIVITY_RETENTION_DAYS, POSTGRES_ACTIVITY_PARTITIONS_AHEAD '
+                         'and POSTGRES_ACTIVITY_MAINTENANCE_INTERVAL must be positive!')
+
+    if not 0 < db.pool_min_size <= db.pool_max_size:
+        raise ValueError('POSTGRES_POOL_MIN_SIZE must be positive and not greater than POSTGRES_POOL_MAX_SIZE!')
+
+    fsm_state_ttl = env.int('REDIS_FSM_STATE_TTL', default=86400)
+    fsm_data_ttl = env.int('REDIS_FSM_DATA_TTL', default=86400)
+
     redis = RedisSettings(
         host=env('REDIS_HOST'),
         port=int(env('REDIS_PORT')),
         db=int(env('REDIS_DATABASE')),
         username=env('REDIS_USERNAME'),
-        password=env('REDIS_PASSWORD')
+        password=env('REDIS_PASSWORD'),
+        fsm_cache_size=env.int('REDIS_FSM_CACHE_SIZE', default=100_000),
+        fsm_cache_bytes=env.int('REDIS_FSM_CACHE_BYTES', default=64 * 1024 * 1024),
+        fsm_cache_ttl=env.float('REDIS_FSM_CACHE_TTL', default=60.0),
+        fsm_serializer=env('REDIS_FSM_SERIALIZER', default='msgpack'),
+        fsm_key_prefix=env('REDIS_FSM_KEY_PREFIX', default='f'),
+        fsm_state_ttl=fsm_state_ttl if fsm_state_ttl > 0 else None,
+        fsm_data_ttl=fsm_data_ttl if fsm_data_ttl > 0 else None,
+        active_users_ttl_days=env.int('REDIS_ACTIVE_USERS_TTL_DAYS', default=400),
+    )
+
+    if redis.active_users_ttl_days <= 0:
+        raise ValueError('REDIS_ACTIVE_USERS_TTL_DAYS must be positive!')
+
+    if redis.fsm_cache_size <= 0 or redis.fsm_cache_bytes <= 0 or redis.fsm_cache_ttl <= 0:
+        raise ValueError('REDIS_FSM_CACHE_SIZE, REDIS_FSM_CACHE_BYTES and REDIS_FSM_CACHE_TTL must be positive!')
+
+    if redis.fsm_serializer not in ('json', 'msgpack'):
+        raise ValueError('REDIS_FSM_SERIALIZER must be json or msgpack!')
+
+    if not redis.fsm_key_prefix:
+        raise ValueError('REDIS_FSM_KEY_PREFIX must not be empty!')
+
+    webhook = WebhookSettings(
+        enabled=env.bool('WEBHOOK_ENABLED', default=False),
+        base_url=env('WEBHOOK_BASE_URL', default=''),
+        path=env('WEBHOOK_PATH', default='/webhook'),
+        secret=env('WEBHOOK_SECRET', default=None) or None,
+        host=env('WEBHOOK_HOST', default='0.0.0.0'),
+        port=env.int('WEBHOOK_PORT', default=8080),
+        max_concurrent_updates=env.int('WEBHOOK_MAX_CONCURRENT_UPDATES', default=100),
     )
 
+    if webhook.enabled and not webhook.base_url:
+        raise ValueError('WEBHOOK_BASE_URL must not be empty when WEBHOOK_ENABLED is set!')
+
+    # Without it anyone who can reach the port could post updates on behalf of an admin
+    if webhook.enabled and not webhook.secret:
+        raise ValueError('WEBHOOK_SECRET must not be empty when WEBHOOK_ENABLED is set!')
+
+    if webhook.secret is not None and not re.fullmatch(r'[A-Za-z0-9_-]{1,256}', webhook.secret):
+        raise ValueError('WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ and -!')
+
+    if webhook.max_concurrent_updates <= 0:
+        raise ValueError('WEBHOOK_MAX_CONCURRENT_UPDATES must be positive!')
+
+    metrics = MetricsSettings(
+        enabled=env.bool('METRICS_ENABLED', default=False),
+        host=env('METRICS_HOST', default='127.0.0.1'),
+        port=env.int('METRICS_PORT', default=9100),
+    )
+
+    if metrics.enabled and webhook.enabled and metrics.port == webhook.port:
+        raise ValueError('METRICS_PORT must differ from WEBHOOK_PORT!')
+
     log = LogSettings(
         level=env('LOG_LEVEL'),
-        frmt=env('LOG_FORMAT')
+        frmt=env('LOG_FORMAT'),
+        json=env.bool('LOG_JSON', default=False),
+        rate_limit=env.int('LOG_RATE_LIMIT', default=20),
+        rate_limit_interval=env.float('LOG_RATE_LIMIT_INTERVAL', default=1.0),
     )
 
+    if log.rate_limit_interval <= 0:
+        raise ValueError('LOG_RATE_LIMIT_INTERVAL must be positive!')
+
     logger.info('Configuration loaded successfully!!!')
 
     return Config(
-        bot=BotSettings(token=token, admin_ids=admin_ids),
+        bot=BotSettings(
+            token=token,
+            admin_ids=admin_ids,
+            api_base_url=env('BOT_API_BASE_URL', default='https://api.telegram.org'),
+            max_concurrent_updates=max_concurrent_updates,
+            max_pending_updates=max_pending_updates,
+            outbound_rate=outbound_rate,
+            outbound_chat_rate=outbound_chat_rate,
+            outbound_chat_burst=outbound_chat_burst,
+            outbound_group_rate=outbound_group_rate,
+            outbound_max_retries=outbound_max_retries,
+        ),
         log=log,
         db=db,
-        redis=redis
+        redis=redis,
+        webhook=webhook,
+        metrics=metrics,
     )
@@ -17,9 +17,10 @@ EN: dict[str, str] = {
                    "/start - restarting the bot\n"
                    "/lang - set the interface language\n"
                    "/help - view this help\n"
-                   "/ban - ban the user\n"
-                   "/unban - unban the user\n"
-                   "/statistics - view user activity statistics",
+                   "/ban - ban users, or send a file of IDs with /ban as its caption\n"
+                   "/unban - unban users, or send a file of IDs with /unban as its caption\n"
+                   "/statistics - view user activity statistics\n"
+                   "/broadcast - send a message to all users",
     "/lang": "Select a language",
     "no_echo": "This type of update is not supported by the send_copy method.",
     "ru": "🇷🇺 Russian",
@@ -34,19 +35,37 @@ EN: dict[str, str] = {
     "/start_description": "Restart the bot",
     "/lang_description": "Configure the interface language",
     "/help_description": "View the help for the bot",
-    "/ban_description": "Ban a user (requires user_id or username)",
-    "/unban_description": "Unban the user (requires user_id or username)",
+    "/ban_description": "Ban users (user_ids or usernames, or a file of IDs)",
+    "/unban_description": "Unban users (user_ids or usernames, or a file of IDs)",
     "/statistics_description": "View user activity statistics",
+    "/broadcast_description": "Send a message to all users (reply to a message or add text)",
     "empty_ban_answer": "❗ Please specify the user's ID or @username.",
     "incorrect_ban_arg": "⚠️ <b>Incorrect format.</b>\n\nUse /ban <code>ID</code> "
-                         "or /ban <code>@username</code>",
+                         "or /ban <code>@username</code>, several of them separated by spaces, "
+                         "or send a .txt or .csv file of IDs with /ban as its caption",
     "already_banned": "❗ The user is already banned!",
     "successfully_banned": "⚠️ The user has been successfully banned!",
+    "ban_summary": "⚠️ Banned: {}\nAlready banned: {}\nNot found: {}",
+    "ban_list_too_large": "❗ The file is too large, send at most {} KB of IDs.",
     "no_user": "❗ There is no such user in the database!",
     "empty_unban_answer": "❗ Please specify the user's ID or @username.",
     "incorrect_unban_arg": "⚠️ <b>Incorrect format.</b>\n\nUse /unban <code>ID</code> "
-                           "or /unban <code>@username</code>",
+                           "or /unban <code>@username</code>, several of them separated by spaces, "
+                           "or send a .txt or .csv file of IDs with /unban as its caption",
     "not_banned": "❗ The user was not banned anyway!",
     "successfully_unbanned": "⚠️ The user has been successfully unbanned!",
+    "unban_summary": "⚠️ Unbanned: {}\nWere not banned: {}\nNot found: {}",
     "statistics": "📊 <b>Statistics on user actions:</b>\n\n{}",
+    "active_users": "👥 <b>Active users</b>\n\nToday: {}\nLast 7 days: {}\nLast 30 days: {}\n\n"
+                    "For a date range use /statistics <code>YYYY-MM-DD</code> <code>YYYY-MM-DD</code>",
+    "active_users_range": "👥 Active users from {} to {}: <b>{}</b>",
+    "incorrect_statistics_arg": "⚠️ <b>Incorrect format.</b>\n\nUse /statistics, "
+                                "/statistics <code>YYYY-MM-DD</code> "
+                                "or /statistics <code>YYYY-MM-DD</code> <code>YYYY-MM-DD</code>. "
+                                "The range has to include days that are still kept for statistics",
+    "empty_broadcast_answer": "❗ Reply with /broadcast to the message you want to send "
+                              "or use /broadcast <code>text</code>",
+    "broadcast_started": "📣 Broadcast <code>{}</code> has started. I will report when it is finished.",
+    "broadcast_finished": "📣 Broadcast <code>{}</code> is finished.\n\n"
+                          "Delivered: {}\nBlocked the bot: {}\nFailed: {}",
 }
\ No newline at end of file
@@ -17,9 +17,10 @@ RU: dict[str, str] = {
                    "/start - перезапуск бота\n"
                    "/lang - установить язык интерфейса\n"
                    "/help - посмотреть эту справку\n"
-                   "/ban - забанить пользователя\n"
-                   "/unban - разбанить пользователя\n"
-                   "/statistics - посмотреть статистику активности пользователей",
+                   "/ban - забанить пользователей или отправить файл с ID и подписью /ban\n"
+                   "/unban - разбанить пользователей или отправить файл с ID и подписью /unban\n"
+                   "/statistics - посмотреть статистику активности пользователей\n"
+                   "/broadcast - отправить сообщение всем пользователям",
     "/lang": "Выберите язык",
     "no_echo": "Данный тип апдейтов не поддерживается методом send_copy",
     "ru": "🇷🇺 Русский",
@@ -34,19 +35,37 @@ RU: dict[str, str] = {
     "/start_description": "Перезапустить бота",
     "/lang_description": "Настроить язык интерфейса",
     "/help_description": "Посмотреть справку по работе бота",
-    "/ban_description": "Забанить пользователя (требует user_id или username)",
-    "/unban_description": "Разбанить пользователя (требует user_id или username)",
+    "/ban_description": "Забанить пользователей (user_id, username или файл с ID)",
+    "/unban_description": "Разбанить пользователей (user_id, username или файл с ID)",
     "/statistics_description": "Посмотреть статистику активности пользователей",
+    "/broadcast_description": "Отправить сообщение всем пользователям (ответом на сообщение или с текстом)",
     "empty_ban_answer": "❗ Пожалуйста, укажите ID пользователя или @username.",
     "incorrect_ban_arg": "⚠️ <b>Неверный формат.</b>\n\nИспользуйте: /ban <code>ID</code> "
-                         "или /ban <code>@username</code>",
+                         "или /ban <code>@username</code>, можно несколько через пробел, "
+                         "или отправьте .txt или .csv файл с ID и подписью /ban",
     "already_banned": "❗ Пользователь и так уже забанен!",
     "successfully_banned": "⚠️ Пользователь успешно забанен!",
+    "ban_summary": "⚠️ Забанено: {}\nУже были забанены: {}\nНе найдено: {}",
+    "ban_list_too_large": "❗ Файл слишком большой, отправьте не больше {} КБ с ID.",
     "no_user": "❗ Нет такого пользователя в базе данных!",
     "empty_unban_answer": "❗ Пожалуйста, укажите ID пользователя или @username.",
     "incorrect_unban_arg": "⚠️ <b>Неверный формат.</b>\n\nИспользуйте: /unban <code>ID</code> "
-                           "или /unban <code>@username</code>",
+                           "или /unban <code>@username</code>, можно несколько через пробел, "
+                           "или отправьте .txt или .csv файл с ID и подписью /unban",
     "not_banned": "❗ Пользователь и так не был забанен!",
     "successfully_unbanned": "⚠️ Пользователь успешно разбанен!",
-    "statistics": "📊 <b>Статистика по действиям пользователей:</b>\n\n{}"
+    "unban_summary": "⚠️ Разбанено: {}\nНе были забанены: {}\nНе найдено: {}",
+    "statistics": "📊 <b>Статистика по действиям пользователей:</b>\n\n{}",
+    "active_users": "👥 <b>Активные пользователи</b>\n\nСегодня: {}\nЗа 7 дней: {}\nЗа 30 дней: {}\n\n"
+                    "Для периода используйте /statistics <code>ГГГГ-ММ-ДД</code> <code>ГГГГ-ММ-ДД</code>",
+    "active_users_range": "👥 Активных пользователей с {} по {}: <b>{}</b>",
+    "incorrect_statistics_arg": "⚠️ <b>Неверный формат.</b>\n\nИспользуйте: /statistics, "
+                                "/statistics <code>ГГГГ-ММ-ДД</code> "
+                                "или /statistics <code>ГГГГ-ММ-ДД</code> <code>ГГГГ-ММ-ДД</code>. "
+                                "Диапазон должен включать дни, за которые ещё хранится статистика",
+    "empty_broadcast_answer": "❗ Ответьте командой /broadcast на сообщение, которое нужно разослать, "
+                              "или используйте /broadcast <code>текст</code>",
+    "broadcast_started": "📣 Рассылка <code>{}</code> запущена. Я сообщу, когда она завершится.",
+    "broadcast_finished": "📣 Рассылка <code>{}</code> завершена.\n\n"
+                          "Доставлено: {}\nЗаблокировали бота: {}\nОшибок: {}",
 }
\ No newline at end of file
@@ -1,15 +1,14 @@
 import asyncio
-import logging
 
 from app.bot import main
+from app.infrastructure.logs import setup_logging
 from config.config import Config, load_config
 
 config: Config = load_config('.env')
 
-logging.basicConfig(
-    level=config.log.level,
-    format=config.log.frmt,
-    style='{'
-)
-
-asyncio.run(main(config))
\ No newline at end of file
+listener = setup_logging(config.log)
+try:
+    asyncio.run(main(config))
+finally:
+    # Writes out whatever is still queued
+    listener.stop()
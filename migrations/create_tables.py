@@ -1,8 +1,10 @@
 import asyncio
 import logging
+from datetime import date, timedelta
 from psycopg import AsyncConnection, Error
 
 from config.config import Config, load_config
+from app.infrastructure.database.activity import ActivityPartitionMaintainer
 from app.infrastructure.database.connections import get_pg_connection
 
 
@@ -11,7 +13,6 @@ config: Config = load_config('.env')
 logging.basicConfig(
     level=config.log.level,
     format=config.log.frmt,
-    style='{'
 )
 
 logger = logging.getLogger(__name__)
@@ -27,6 +28,11 @@ async def main():
             user=config.db.user,
             password=config.db.password
         )
+        maintainer = ActivityPartitionMaintainer(
+            db_pool=None,
+            retention_days=config.db.activity_retention_days,
+            ahead_days=config.db.activity_partitions_ahead,
+        )
 
         async with connection.transaction():
             async with connection.cursor() as cursor:
@@ -41,22 +47,127 @@ async def main():
                             role VARCHAR(30) NOT NULL,
                             is_alive BOOLEAN NOT NULL,
                             banned BOOLEAN NOT NULL
-                        );'''
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_users_banned
+                        ON users (user_id) WHERE banned;
+                        '''
+                    )
+                # Only the most recently added holder of a username keeps it, the others are stale
+                await cursor.execute(
+                    query='''
+                        UPDATE users
+                        SET username = NULL
+                        WHERE id IN (
+                            SELECT id
+                            FROM (
+                                SELECT id, row_number() OVER (PARTITION BY lower(username) ORDER BY id DESC) AS n
+                                FROM users
+                                WHERE username IS NOT NULL
+                            ) AS holders
+                            WHERE n > 1
+                        );
+                        CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username
+                        ON users (lower(username)) WHERE username IS NOT NULL;
+                        '''
                     )
+                await cursor.execute(
+                    query='''
+                        SELECT relkind
+                        FROM pg_class
+                        WHERE oid = to_regclass('activity');
+                        '''
+                    )
+                row = await cursor.fetchone()
+                # An ordinary table from before partitioning, its rows are moved over below
+                legacy = row is not None and row[0] == 'r'
+                if legacy:
+                    await cursor.execute('ALTER TABLE activity RENAME TO activity_legacy')
+
                 await cursor.execute(
                     query='''
                         CREATE TABLE IF NOT EXISTS activity (
-                            id SERIAL PRIMARY KEY,
-                            user_id BIGINT REFERENCES users(user_id),
-                            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                            user_id BIGINT NOT NULL REFERENCES users(user_id),
                             activity_date DATE NOT NULL DEFAULT CURRENT_DATE,
-                            actions INT NOT NULL DEFAULT 1
+                            actions INT NOT NULL DEFAULT 1,
+                            CONSTRAINT activity_user_day_pkey PRIMARY KEY (user_id, activity_date)
+                        ) PARTITION BY RANGE (activity_date);
+                        '''
+                    )
+                await cursor.execute(
+                    query='''
+                        CREATE TABLE IF NOT EXISTS activity_monthly (
+                            user_id BIGINT NOT NULL REFERENCES users(user_id),
+                            month DATE NOT NULL,
+                            actions BIGINT NOT NULL,
+                            PRIMARY KEY (user_id, month)
+                        );
+                        '''
+                    )
+
+                first_day = None
+                if legacy:
+                    await cursor.execute('SELECT MIN(activity_date) FROM activity_legacy')
+                    first_day = (await cursor.fetchone())[0]
+
+                await maintainer.maintain(connection, first_day=first_day)
+
+                if legacy:
+                    cutoff = date.today() - timedelta(days=maintainer.retention_days)
+                    await cursor.execute(
+                        query='''
+                            INSERT INTO activity_monthly (user_id, month, actions)
+                            SELECT user_id, date_trunc('month', activity_date)::date, SUM(actions)
+                            FROM activity_legacy
+                            WHERE user_id IS NOT NULL AND activity_date < %s
+                            GROUP BY 1, 2
+                            ON CONFLICT (user_id, month)
+                            DO UPDATE
+                            SET actions = activity_monthly.actions + EXCLUDED.actions;
+                            ''',
+                        params=(cutoff,),
+                        )
+                    logger.info('%s monthly activity rows rolled up from "activity_legacy"', cursor.rowcount)
+                    # Dates past the pre-created partitions would have nowhere to go
+                    await cursor.execute(
+                        query='''
+                            INSERT INTO activity (user_id, activity_date, actions)
+                            SELECT user_id, activity_date, actions
+                            FROM activity_legacy
+                            WHERE user_id IS NOT NULL AND activity_date >= %s AND activity_date <= %s;
+                            ''',
+                        params=(cutoff, date.today() + timedelta(days=maintainer.ahead_days)),
+                        )
+                    logger.info('%s daily activity rows moved from "activity_legacy"', cursor.rowcount)
+                    await cursor.execute('DROP TABLE activity_legacy')
+
+                await cursor.execute(
+                    query='''
+                        CREATE TABLE IF NOT EXISTS activity_totals (
+                            user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+                            total_actions BIGINT NOT NULL DEFAULT 0
                         );
-                        CREATE UNIQUE INDEX IF NOT EXISTS idx_activity_user_day
-                        ON activity (user_id, activity_date);
+                        CREATE INDEX IF NOT EXISTS idx_activity_totals_top
+                        ON activity_totals (total_actions DESC);
+                        '''
+                    )
+                # Rolled up months count too, they are no longer in "activity"
+                await cursor.execute(
+                    query='''
+                        INSERT INTO activity_totals (user_id, total_actions)
+                        SELECT user_id, SUM(actions)
+                        FROM (
+                            SELECT user_id, actions FROM activity
+                            UNION ALL
+                            SELECT user_id, actions FROM activity_monthly
+                        ) AS all_activity
+                        GROUP BY user_id
+                        ON CONFLICT (user_id)
+                        DO UPDATE
+                        SET total_actions = EXCLUDED.total_actions;
                         '''
                     )
-            logger.info('tables "users" and "activity" successfully created')
+                logger.info('Table "activity_totals" backfilled for %s users', cursor.rowcount)
+            logger.info('tables "users", "activity", "activity_monthly" and "activity_totals" successfully created')
     except Error as db_error:
         logger.exception(f'database specific error {db_error}')
     except Exception as e:
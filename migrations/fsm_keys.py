@@ -0,0 +1,49 @@
+import asyncio
+import logging
+
+from redis.asyncio import Redis
+
+from config.config import Config, load_config
+from app.bot.fsm.migration import migrate_legacy_keys
+from app.bot.fsm.serialization import SERIALIZERS, CompactKeyBuilder
+from app.bot.fsm.storage import PipelinedRedisStorage
+
+
+config: Config = load_config('.env')
+
+logging.basicConfig(
+    level=config.log.level,
+    format=config.log.frmt,
+)
+
+logger = logging.getLogger(__name__)
+
+# One-off: moves FSM records written under `fsm:<chat>:<user>:state|data` to the compact layout
+
+async def main():
+    redis = Redis(
+        host=config.redis.host,
+        port=config.redis.port,
+        db=config.redis.db,
+        password=config.redis.password,
+        username=config.redis.username,
+    )
+    json_dumps, json_loads = SERIALIZERS[config.redis.fsm_serializer]
+
+    try:
+        storage = PipelinedRedisStorage(
+            redis=redis,
+            key_builder=CompactKeyBuilder(prefix=config.redis.fsm_key_prefix),
+            state_ttl=config.redis.fsm_state_ttl,
+            data_ttl=config.redis.fsm_data_ttl,
+            json_loads=json_loads,
+            json_dumps=json_dumps,
+        )
+        await migrate_legacy_keys(redis, storage)
+    except Exception as e:
+        logger.exception(f'Unhandled error {e}')
+    finally:
+        await redis.aclose()
+        logger.info('Connection to Redis closed')
+
+asyncio.run(main())
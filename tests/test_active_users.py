@@ -0,0 +1,143 @@
+import asyncio
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+
+from app.bot.services.active_users import ActiveUsersCounter, month_start
+from benchmarks.active_users_accuracy import MAX_ERROR, check_accuracy, fill, measure, simulate
+
+
+class FakePipeline:
+    def __init__(self, redis: 'FakeRedis'):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self) -> 'FakePipeline':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.commands.clear()
+
+    def pfadd(self, key: str, *values: int) -> None:
+        self.commands.append(('pfadd', key, values))
+
+    def pfmerge(self, key: str, *sources: str) -> None:
+        self.commands.append(('pfmerge', key, sources))
+
+    def expire(self, key: str, ttl: int) -> None:
+        self.commands.append(('expire', key, ttl))
+
+    async def execute(self) -> list:
+        for command, key, args in self.commands:
+            self.redis.calls[command] += 1
+            if command == 'pfadd':
+                self.redis.sets.setdefault(key, set()).update(args)
+            elif command == 'pfmerge':
+                # Like Redis, the destination exists afterwards even if every source was empty
+                merged = self.redis.sets.setdefault(key, set())
+                for source in args:
+                    merged |= self.redis.sets.get(source, set())
+            elif key in self.redis.sets:
+                self.redis.ttls[key] = args
+        return [True] * len(self.commands)
+
+
+class FakeRedis:
+    # Exact sets in place of HyperLogLogs, `bias` scales every count to play a bad estimator
+    def __init__(self, bias: float = 1.0):
+        self.bias = bias
+        self.sets: dict[str, set[int]] = {}
+        self.ttls: dict[str, int] = {}
+        self.calls = Counter()
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def exists(self, key: str) -> int:
+        return int(key in self.sets)
+
+    async def pfcount(self, *keys: str) -> int:
+        self.calls['pfcount'] += 1
+        return round(len(set().union(*(self.sets.get(key, set()) for key in keys))) * self.bias)
+
+
+def test_clamp_cuts_the_range_to_kept_days():
+    counter = ActiveUsersCounter(FakeRedis(), ttl_days=30)
+    today = date.today()
+
+    assert counter.clamp(date(1, 1, 1), date(9999, 12, 31)) == (today - timedelta(days=29), today)
+    assert counter.clamp(today - timedelta(days=3), today - timedelta(days=1)) == (
+        today - timedelta(days=3), today - timedelta(days=1)
+    )
+
+
+def test_clamp_rejects_ranges_outside_kept_days():
+    counter = ActiveUsersCounter(FakeRedis(), ttl_days=30)
+    today = date.today()
+
+    assert counter.clamp(today + timedelta(days=1), today + timedelta(days=5)) is None
+    assert counter.clamp(date(2000, 1, 1), today - timedelta(days=30)) is None
+    assert counter.clamp(today, today - timedelta(days=1)) is None
+
+
+def test_count_skips_days_outside_the_range():
+    redis = FakeRedis()
+    counter = ActiveUsersCounter(redis, ttl_days=30)
+
+    assert asyncio.run(counter.count(date(1, 1, 1), date(1, 12, 31))) == 0
+    assert redis.calls['pfcount'] == 0
+    assert redis.calls['pfmerge'] == 0
+
+
+def test_count_merges_finished_months_once():
+    redis = FakeRedis()
+    counter = ActiveUsersCounter(redis, ttl_days=400)
+    today = date.today()
+    # At least one whole month that ended before yesterday, plus every day since
+    first_day = month_start(month_start(today) - timedelta(days=40))
+
+    history = {}
+    day = first_day
+    while day <= today:
+        history[day] = {day.toordinal() % 50, 1000 + day.day}
+        day += timedelta(days=1)
+
+    async def run() -> int:
+        await fill(counter, history)
+        return await counter.count(first_day, today)
+
+    assert asyncio.run(run()) == len(set().union(*history.values()))
+    merges = redis.calls['pfmerge']
+    assert merges >= 1
+    assert all(ttl == counter.ttl for ttl in redis.ttls.values())
+
+    # The merged months are reused, and the answer stays the same
+    assert asyncio.run(counter.count(first_day, today)) == len(set().union(*history.values()))
+    assert redis.calls['pfmerge'] == merges
+
+
+def test_accuracy_within_three_sigma_passes():
+    random.seed(1)
+    counter = ActiveUsersCounter(FakeRedis(bias=1 + MAX_ERROR / 2), ttl_days=400)
+    history = simulate(days=45, users=2000, daily_share=0.1)
+
+    async def run() -> dict:
+        await fill(counter, history)
+        return await measure(counter, history)
+
+    assert check_accuracy(asyncio.run(run())) < MAX_ERROR
+
+
+def test_accuracy_past_three_sigma_fails():
+    random.seed(1)
+    counter = ActiveUsersCounter(FakeRedis(bias=1 + 2 * MAX_ERROR), ttl_days=400)
+    history = simulate(days=45, users=2000, daily_share=0.1)
+
+    async def run() -> dict:
+        await fill(counter, history)
+        return await measure(counter, history)
+
+    with pytest.raises(AssertionError, match='3 sigma'):
+        check_accuracy(asyncio.run(run()))
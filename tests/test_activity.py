@@ -0,0 +1,51 @@
+import asyncio
+from datetime import date, timedelta
+
+import app.bot  # noqa: F401, loads the packages in the order the bot does
+from app.infrastructure.database.activity import ActivityAggregator
+
+
+class DownPool:
+    # Every checkout fails, like a pool during a database outage
+    def __init__(self):
+        self.attempts = 0
+
+    def connection(self):
+        self.attempts += 1
+        raise OSError('connection refused')
+
+
+def test_failed_flush_keeps_pending_rows():
+    aggregator = ActivityAggregator(DownPool(), max_pending=10, max_retained=100)
+    aggregator.add(1)
+    aggregator.add(1)
+    aggregator.add(2)
+
+    asyncio.run(aggregator.flush())
+
+    assert aggregator._pending == {(1, date.today()): 2, (2, date.today()): 1}
+
+
+def test_failed_flushes_retain_at_most_max_retained_rows():
+    pool = DownPool()
+    aggregator = ActivityAggregator(pool, max_pending=10, max_retained=50)
+    today = date.today()
+
+    # Five days of an outage, 30 new users a day
+    for offset in range(4, -1, -1):
+        day = today - timedelta(days=offset)
+        for user_id in range(offset * 100, offset * 100 + 30):
+            aggregator._pending[user_id, day] = aggregator._pending.get((user_id, day), 0) + 1
+        asyncio.run(aggregator.flush())
+        assert len(aggregator) <= 50
+
+    assert pool.attempts == 5
+    assert len(aggregator) == 50
+    # The newest day is kept whole, older days were dropped first
+    days = [day for _, day in aggregator._pending]
+    assert days.count(today) == 30
+    assert min(days) == today - timedelta(days=1)
+
+
+def test_max_retained_defaults_to_ten_batches():
+    assert ActivityAggregator(DownPool(), max_pending=7).max_retained == 70
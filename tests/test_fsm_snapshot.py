@@ -0,0 +1,136 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+
+from app.bot.fsm.context import BufferedFSMContext
+from app.bot.middlewares.fsm_snapshot import FSMSnapshotMiddleware
+
+WRITES = ('set_state', 'set_data', 'set_state_and_data')
+
+
+class CountingStorage(MemoryStorage):
+    # Every call stands for one Redis round trip of PipelinedRedisStorage
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+
+    @property
+    def writes(self) -> int:
+        return sum(self.calls[call] for call in WRITES)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        self.calls['get_state'] += 1
+        return await super().get_state(key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self.calls['set_state'] += 1
+        await super().set_state(key, state)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        self.calls['get_data'] += 1
+        return await super().get_data(key)
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        self.calls['set_data'] += 1
+        await super().set_data(key, data)
+
+    async def set_state_and_data(self, key: StorageKey, state: StateType, data: dict[str, Any]) -> None:
+        self.calls['set_state_and_data'] += 1
+        await MemoryStorage.set_state(self, key, state)
+        await MemoryStorage.set_data(self, key, data)
+
+
+def build_message(user_id: int) -> Update:
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.now(),
+            chat=Chat(id=user_id, type='private'),
+            from_user=User(id=user_id, is_bot=False, first_name='user'),
+            text='text',
+        ),
+    )
+
+
+def feed(handler: Callable[[FSMContext], Awaitable[None]], state: str | None, data: dict[str, Any]) -> CountingStorage:
+    async def run() -> CountingStorage:
+        router = Router()
+
+        @router.message()
+        async def handle(message: Message, state: FSMContext) -> None:
+            assert isinstance(state, BufferedFSMContext)
+            await handler(state)
+
+        storage = CountingStorage()
+        dp = Dispatcher(storage=storage)
+        dp.include_router(router)
+        dp.update.middleware(FSMSnapshotMiddleware())
+
+        bot = Bot('42:TEST')
+        key = dp.fsm.get_context(bot, 1, 1).key
+        await MemoryStorage.set_state(storage, key, state)
+        await MemoryStorage.set_data(storage, key, data)
+
+        await dp.feed_update(bot, build_message(1))
+        await bot.session.close()
+        return storage
+
+    return asyncio.run(run())
+
+
+def test_lang_save_reads_once_and_writes_once():
+    # The access pattern of process_save_click
+    async def handler(state: FSMContext) -> None:
+        await state.get_data()
+        await state.update_data(lang_settings_msg_id=None, user_lang=None)
+        await state.set_state()
+
+    storage = feed(handler, state='LangSG:lang', data={'lang_settings_msg_id': 1, 'user_lang': 'ru'})
+
+    assert storage.calls['get_state'] == 1
+    assert storage.calls['get_data'] == 1
+    assert storage.writes == 1
+
+
+def test_repeated_updates_are_written_back_once():
+    async def handler(state: FSMContext) -> None:
+        for i in range(5):
+            await state.update_data(counter=i)
+            await state.get_value('counter')
+
+    storage = feed(handler, state=None, data={})
+
+    assert storage.calls['get_data'] == 1
+    assert storage.calls['set_data'] == 1
+    assert storage.writes == 1
+
+
+def test_unchanged_data_is_not_written():
+    async def handler(state: FSMContext) -> None:
+        await state.update_data(user_lang='ru')
+        await state.set_state()
+
+    storage = feed(handler, state=None, data={'user_lang': 'ru'})
+
+    assert storage.calls['get_data'] == 1
+    assert storage.writes == 0
+
+
+def test_read_only_handler_does_not_write():
+    async def handler(state: FSMContext) -> None:
+        await state.get_state()
+        await state.get_data()
+        await state.get_value('user_lang')
+
+    storage = feed(handler, state='LangSG:lang', data={'user_lang': 'ru'})
+
+    assert storage.calls['get_data'] == 1
+    assert storage.writes == 0